@@ -0,0 +1,227 @@
+import asyncio
+import os
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Union
+
+from filters import EntryFilter
+from quark import QuarkPanFileManager, QuarkTaskError
+from quark_login import CONFIG_DIR, QuarkLogin
+from tasks import CAPACITY_LIMIT
+from utils import custom_print, format_size, parse_share_url
+
+ACCOUNTS_DIR = f'{CONFIG_DIR}/accounts'  # one sub-directory per account, holding its cookies.txt and config.json
+ACCOUNT_WORKERS = 2  # share links one account works on at the same time
+
+
+@dataclass
+class Account:
+    name: str
+    manager: Union[QuarkPanFileManager, None] = field(repr=False)  # None when the cookie was unusable
+    user: str = ''
+    folder_id: str = '0'
+    dir_name: str = ''
+    free: int = 0  # bytes, refreshed after every transfer
+    enabled: bool = True
+    reason: str = ''
+    active: int = 0
+    done: int = 0
+    failed: int = 0
+
+    def score(self, download: bool) -> tuple:
+        """Higher is better: accounts with room first, then the fastest observed rate per running job."""
+        bucket = self.manager.rate_limiter.get('download' if download else 'save')
+        return (download or self.free > 0, bucket.rate / (self.active + 1), self.free)
+
+    def disable(self, reason: str) -> None:
+        if self.enabled:
+            self.enabled, self.reason = False, reason
+            custom_print(f'Akun {self.name} ({self.user}) dinonaktifkan：{reason}', error_msg=True)
+
+
+class AccountPool:
+    """Several logged-in accounts, each with its own QuarkPanFileManager session and save folder.
+
+    Share links are handed to whichever account has free space and the best observed rate,
+    so per-account rate limits and quotas add up instead of capping the batch. An account whose
+    session expires, or whose drive is full, stops receiving links; its link goes to another account.
+    A download link is passed on until it reaches the account that owns the share.
+    """
+
+    def __init__(self, accounts_dir: str = ACCOUNTS_DIR, names: Union[Iterable[str], None] = None,
+                 workers: int = ACCOUNT_WORKERS) -> None:
+        self.accounts_dir = accounts_dir
+        self.names = list(names) if names else None
+        self.workers = max(1, workers)
+        self.accounts: list[Account] = []
+        self._changed: Union[asyncio.Condition, None] = None
+
+    def discover(self) -> list[str]:
+        """Account names under accounts_dir that have a cookies.txt."""
+        if not os.path.isdir(self.accounts_dir):
+            return []
+        return sorted(name for name in os.listdir(self.accounts_dir)
+                      if os.path.isfile(f'{self.accounts_dir}/{name}/cookies.txt') and (not self.names or name in self.names))
+
+    def add(self, name: str) -> None:
+        """Logs a new account in through the browser and stores its cookie under accounts_dir/name."""
+        config_dir = f'{self.accounts_dir}/{name}'
+        os.makedirs(config_dir, exist_ok=True)
+        QuarkLogin(headless=False, slow_mo=500, cookie_path=f'{config_dir}/cookies.txt',
+                   profile_dir=f'{config_dir}/web_browser_data').login()
+
+    async def open_account(self, name: str) -> Account:
+        config_dir = f'{self.accounts_dir}/{name}'
+        if not QuarkLogin(cookie_path=f'{config_dir}/cookies.txt').check_cookies():
+            # never open a login window for a pooled account
+            return Account(name, None, enabled=False, reason='cookie kosong atau kedaluwarsa')
+        manager = QuarkPanFileManager(headless=True, config_dir=config_dir)
+        account = Account(name, manager)
+        try:
+            user = await manager.fetch_user_info()
+            if not user:
+                account.enabled, account.reason = False, 'sesi kedaluwarsa'
+                return account
+            account.user, account.folder_id, account.dir_name = manager.init_config(user, manager.pdir_id,
+                                                                                    manager.dir_name)
+            manager.user, manager.pdir_id, manager.dir_name = account.user, account.folder_id, account.dir_name
+            total, used = await manager.get_capacity()
+            account.free = total - used
+        except Exception as e:
+            account.enabled, account.reason = False, f'{type(e).__name__}: {e}'
+        return account
+
+    async def open(self) -> list[Account]:
+        names = self.discover()
+        opened = await asyncio.gather(*(self.open_account(name) for name in names), return_exceptions=True)
+        # an account that could not be opened stays in the pool disabled, so the others still run and close()
+        # still closes every manager that was created
+        self.accounts = [account if isinstance(account, Account)
+                         else Account(name, None, enabled=False, reason=f'{type(account).__name__}: {account}')
+                         for name, account in zip(names, opened)]
+        self._changed = asyncio.Condition()
+        for account in self.accounts:
+            if account.enabled:
+                custom_print(f'Akun {account.name}：{account.user}，folder {account.dir_name}，'
+                             f'sisa {format_size(account.free)}')
+            else:
+                custom_print(f'Akun {account.name} tidak dipakai：{account.reason}', error_msg=True)
+        return [account for account in self.accounts if account.enabled]
+
+    async def close(self) -> None:
+        await asyncio.gather(*(account.manager.close() for account in self.accounts if account.manager is not None))
+
+    async def __aenter__(self) -> 'AccountPool':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def acquire(self, download: bool, exclude: set[str]) -> Union[Account, None]:
+        """The best account with a free slot, waiting for one; None once no usable account is left."""
+        async with self._changed:
+            while True:
+                usable = [a for a in self.accounts if a.enabled and a.name not in exclude and (download or a.free > 0)]
+                if not usable:
+                    return None
+                ready = [a for a in usable if a.active < self.workers]
+                if ready:
+                    account = max(ready, key=lambda a: a.score(download))
+                    account.active += 1
+                    return account
+                await self._changed.wait()
+
+    async def release(self, account: Account) -> None:
+        async with self._changed:
+            account.active -= 1
+            self._changed.notify_all()
+
+    @staticmethod
+    async def foreign_share(account: Account, url: str) -> bool:
+        """True when `url` opens but lives in another drive; only the owning account can download it.
+
+        The opened share stays cached, so the run that follows does not fetch it again.
+        """
+        try:
+            report = await account.manager.validate_link(url)
+        except Exception:
+            return False  # let run_link report the error
+        return report['status'] != 'error' and not report['is_owner']
+
+    async def run_link(self, account: Account, url: str, download: bool, force: bool,
+                       entry_filter: Union[EntryFilter, None], incremental: bool) -> tuple[bool, str]:
+        manager = account.manager
+        try:
+            ok = await manager.run(url, account.folder_id, download=download, incremental=incremental, force=force,
+                                   entry_filter=entry_filter)
+            error = ''
+        except QuarkTaskError as e:
+            ok, error = False, str(e)
+            if e.code == CAPACITY_LIMIT:
+                account.free = 0
+                account.disable('ruang penyimpanan penuh')
+        except Exception as e:
+            ok, error = False, f'{type(e).__name__}: {e}'
+        if manager.session_expired:
+            account.disable('sesi kedaluwarsa')
+        elif not download and account.enabled:
+            try:
+                total, used = await manager.get_capacity()
+                account.free = total - used
+            except Exception:
+                pass
+        return ok, error
+
+    async def batch_run(self, urls: Iterable[str], download: bool = False, force: bool = False,
+                        entry_filter: Union[EntryFilter, None] = None, incremental: bool = False) -> list[dict[str, Any]]:
+        """Like QuarkPanFileManager.batch_run, spread over every enabled account of the pool."""
+        queue: asyncio.Queue = asyncio.Queue()
+        results: list[dict[str, Any]] = []
+        seen: set[str] = set()
+        for index, url in enumerate(urls, 1):
+            pwd_id = parse_share_url(url)[0]
+            if pwd_id in seen:
+                custom_print(f'Tautan ke-{index} adalah duplikat, dilewati：{url.strip()}')
+                results.append({'index': index, 'url': url.strip(), 'ok': True, 'error': '', 'account': ''})
+                continue
+            seen.add(pwd_id)
+            queue.put_nowait((index, url.strip(), set()))
+
+        async def worker() -> None:
+            while not queue.empty():
+                index, url, tried = queue.get_nowait()
+                account = await self.acquire(download, tried)
+                if account is None:
+                    error = 'tidak ada akun pemilik tautan ini' if download and tried else 'tidak ada akun yang tersedia'
+                    results.append({'index': index, 'url': url, 'ok': False, 'account': '', 'error': error})
+                    continue
+                try:
+                    if download and await self.foreign_share(account, url):
+                        # a share can only be downloaded by the account that owns it
+                        tried.add(account.name)
+                        queue.put_nowait((index, url, tried))
+                        continue
+                    ok, error = await self.run_link(account, url, download, force, entry_filter, incremental)
+                finally:
+                    await self.release(account)
+                if not ok and not account.enabled:
+                    # the account, not the link, failed: give the link to another account
+                    tried.add(account.name)
+                    queue.put_nowait((index, url, tried))
+                    continue
+                account.done += ok
+                account.failed += not ok
+                results.append({'index': index, 'url': url, 'ok': ok, 'error': error, 'account': account.name})
+
+        slots = self.workers * max(1, sum(a.enabled for a in self.accounts))
+        await asyncio.gather(*(worker() for _ in range(slots)))
+
+        results.sort(key=lambda r: r['index'])
+        failed = [r for r in results if not r['ok']]
+        custom_print(f'Transfer massal selesai：{len(results) - len(failed)} berhasil，{len(failed)} gagal')
+        for account in self.accounts:
+            state = 'aktif' if account.enabled else account.reason
+            custom_print(f'Akun {account.name}：{account.done} berhasil，{account.failed} gagal，{state}')
+        for r in failed:
+            custom_print(f"{r['index']}. {r['url']} {r['error']}", error_msg=True)
+        return results
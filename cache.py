@@ -0,0 +1,84 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Union
+
+from utils import read_config, save_config
+
+CACHE_SIZE = 2048  # entries kept before the least recently used ones are evicted
+STOKEN_TTL = 1800.0  # seconds a share stoken is reused
+LISTING_TTL = 300.0  # seconds a share or drive listing page is reused
+CACHE_PATH = None  # e.g. 'config/cache.json' to keep the cache between runs
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after a per-entry TTL.
+
+    Keys are tuples whose first item names the kind of entry (`'stoken'`, `'detail'`, `'drive'`),
+    which is what invalidate() matches prefixes against. With `path` the cache is written there
+    as JSON by save() and read back on start, so only JSON-serializable values belong in it.
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = LISTING_TTL, path: Union[str, None] = CACHE_PATH) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key, _MISSING)
+        if item is not _MISSING and item[0] > time.time():
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+        if item is not _MISSING:
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Union[float, None] = None) -> None:
+        self._data[key] = (time.time() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, *prefix: Hashable) -> int:
+        """Drops every key starting with `prefix` (everything without one) and returns how many went."""
+        keys = [key for key in self._data if key[:len(prefix)] == prefix]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f'{self.hits} hit，{self.misses} miss ({rate:.0f}%)，{len(self._data)} entri'
+
+    def load(self) -> None:
+        try:
+            entries = read_config(self.path, 'json')
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return
+        now = time.time()
+        for key, expires, value in entries:
+            if expires > now:
+                self._data[tuple(key)] = (expires, value)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        now = time.time()
+        entries = [[list(key), expires, value] for key, (expires, value) in self._data.items() if expires > now]
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        save_config(self.path + '.tmp', json.dumps(entries, ensure_ascii=False))
+        os.replace(self.path + '.tmp', self.path)
@@ -0,0 +1,353 @@
+import time
+
+START = time.perf_counter()
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+from contextlib import asynccontextmanager  # noqa: E402
+from typing import Any, AsyncIterator, Union  # noqa: E402
+
+EXPIRE_OPTIONS = {1: 2, 7: 3, 30: 4, 0: 1}  # days (0 = permanent) -> expired_type of the share API
+opened: list[Any] = []  # the QuarkPanFileManagers of this run, for --timing
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group('filter')
+    group.add_argument('--include', help='comma separated name globs (or re:<regex>) a file must match')
+    group.add_argument('--exclude', help='comma separated name globs (or re:<regex>) of files and folders to skip')
+    group.add_argument('--ext', help='comma separated extensions, e.g. mkv,mp4')
+    group.add_argument('--min-size', help='e.g. 500M or 1G')
+    group.add_argument('--max-size', help='e.g. 4G')
+    group.add_argument('--after', help='modified on or after YYYY-MM-DD')
+    group.add_argument('--before', help='modified before YYYY-MM-DD')
+
+
+def add_url_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('urls', nargs='*', help='share links; omitted means the links in --file')
+    parser.add_argument('--file', default='url.txt',
+                        help='file with one share link per line, - for stdin (default url.txt)')
+
+
+def add_checkpoint_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group('checkpoint', 'links from --file resume where the last run stopped')
+    group.add_argument('--restart', action='store_true', help='forget the progress through --file and start over')
+    group.add_argument('--retry-failed', action='store_true', help='run the links that failed last time again')
+    group.add_argument('--checkpoint', metavar='NAME',
+                       help='name the progress is kept under; required to resume stdin (--file -)')
+
+
+def add_account_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--accounts', nargs='?', const='*', metavar='NAMES',
+                        help='spread the links over the accounts in config/accounts (all, or a comma separated list)')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='quark', description='QuarkPanTool without the interactive menu')
+    parser.add_argument('--timing', action='store_true', help='print start-up and first API response times')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    transfer = sub.add_parser('transfer', help='save share links to the cloud drive')
+    add_url_arguments(transfer)
+    transfer.add_argument('--folder-id', help='target folder fid (default: the saved folder)')
+    transfer.add_argument('--workers', type=int, help='links transferred at the same time')
+    transfer.add_argument('--force', action='store_true', help='transfer links the ledger already has again')
+    transfer.add_argument('--plan', action='store_true', help='check the free space first and only transfer what fits')
+    add_checkpoint_arguments(transfer)
+    add_account_arguments(transfer)
+    add_filter_arguments(transfer)
+
+    download = sub.add_parser('download', help='download shares of your own drive')
+    add_url_arguments(download)
+    download.add_argument('--workers', type=int, default=1, help='links downloaded at the same time')
+    download.add_argument('--incremental', action='store_true', help='skip files downloaded before and unchanged')
+    add_checkpoint_arguments(download)
+    add_account_arguments(download)
+    add_filter_arguments(download)
+
+    share = sub.add_parser('share', help='create share links for drive folders')
+    share.add_argument('url', nargs='?', help='web address of the drive folder to share')
+    share.add_argument('--depth', type=int, default=0, help='share the folders N levels down (0 = the folder itself)')
+    share.add_argument('--expire', type=int, choices=sorted(EXPIRE_OPTIONS), default=0,
+                       help='days the links stay valid, 0 = permanent')
+    share.add_argument('--encrypt', action='store_true', help='protect the links with an extraction code')
+    share.add_argument('--password', default='', help='extraction code (random when --encrypt is given without one)')
+    share.add_argument('--retry', action='store_true', help='share the failed folders of the last run again')
+    share.add_argument('--export', action='store_true',
+                       help='write share_url.txt, share_error.txt and retry.txt for the last run')
+
+    mkdir = sub.add_parser('mkdir', help='create a folder in the drive root and save into it')
+    mkdir.add_argument('name')
+
+    switch = sub.add_parser('switch-dir', help='change the save folder')
+    switch.add_argument('target', help='0 for the root, a path like /Film/2024, a folder fid or a root folder name')
+
+    validate = sub.add_parser('validate', help='check share links and write url_report.txt')
+    add_url_arguments(validate)
+
+    accounts = sub.add_parser('accounts', help='list the pooled accounts, or log a new one in')
+    accounts.add_argument('--add', metavar='NAME', help='log in through the browser and save the cookie as account NAME')
+
+    queue = sub.add_parser('queue', help='spread a batch over several hosts through a shared job queue')
+    queue.add_argument('--db', default='share/queue.db',
+                       help='queue file on a volume every host can reach, or memory: for a local trial')
+    queue.add_argument('--batch', default='default', help='name of the batch')
+    actions = queue.add_subparsers(dest='action', required=True)
+    load = actions.add_parser('load', help='queue share links to transfer or download')
+    add_url_arguments(load)
+    load.add_argument('--kind', choices=('transfer', 'download'), default='transfer')
+    load_share = actions.add_parser('load-share', help='queue the drive folders below a folder for sharing')
+    load_share.add_argument('url', help='web address of the drive folder')
+    load_share.add_argument('--depth', type=int, default=1)
+    load_share.add_argument('--expire', type=int, choices=sorted(EXPIRE_OPTIONS), default=0)
+    load_share.add_argument('--encrypt', action='store_true')
+    load_share.add_argument('--password', default='')
+    work = actions.add_parser('work', help='lease and run jobs until the batch is finished')
+    work.add_argument('--folder-id', help='target folder fid (default: the saved folder)')
+    work.add_argument('--concurrency', type=int, help='jobs run at the same time by this worker')
+    work.add_argument('--worker-id', help='name of this worker (default: host-pid)')
+    work.add_argument('--lease', type=float, help='seconds a lease lasts without a heartbeat')
+    work.add_argument('--force', action='store_true')
+    work.add_argument('--incremental', action='store_true')
+    add_filter_arguments(work)
+    actions.add_parser('status', help='job counts of the batch')
+    actions.add_parser('export', help='merge the results into share/ and share/queue_report.txt')
+    actions.add_parser('retry', help='queue the failed jobs of the batch again')
+
+    daemon = sub.add_parser('daemon', help='run the local job API')
+    daemon.add_argument('--host', default='127.0.0.1')
+    daemon.add_argument('--port', type=int, default=8765)
+    daemon.add_argument('--socket', help='listen on a Unix socket instead of TCP')
+    daemon.add_argument('--workers', type=int, default=2)
+    return parser
+
+
+def read_urls(args: argparse.Namespace) -> list[str]:
+    if args.urls:
+        return args.urls
+    from quark import load_url_file
+
+    try:
+        return load_url_file(args.file)
+    except FileNotFoundError:
+        return []
+
+
+@asynccontextmanager
+async def open_manager() -> AsyncIterator[Any]:
+    """A QuarkPanFileManager for the saved, still logged-in cookie, or None after saying why.
+
+    Like AccountPool.open_account it never opens a login window or waits for input.
+    """
+    from quark import QuarkPanFileManager
+    from quark_login import QuarkLogin
+
+    if not QuarkLogin().check_cookies():
+        print('Belum masuk atau cookie kedaluwarsa; jalankan `python quark.py` tanpa argumen untuk masuk.',
+              file=sys.stderr)
+        yield None
+        return
+    async with QuarkPanFileManager(headless=True) as manager:
+        opened.append(manager)
+        user = await manager.fetch_user_info()
+        if not user:
+            print('Sesi kedaluwarsa; jalankan `python quark.py` tanpa argumen untuk masuk kembali.', file=sys.stderr)
+            yield None
+            return
+        manager.user, manager.pdir_id, manager.dir_name = manager.init_config(user, manager.pdir_id, manager.dir_name)
+        yield manager
+
+
+async def run_command(args: argparse.Namespace) -> bool:
+    from filters import build_filter
+    from quark import TRANSFER_WORKERS
+
+    entry_filter = None
+    if hasattr(args, 'include'):
+        entry_filter = build_filter(include=args.include, exclude=args.exclude, extensions=args.ext,
+                                    min_size=args.min_size, max_size=args.max_size,
+                                    modified_after=args.after, modified_before=args.before)
+
+    if args.command == 'accounts' or getattr(args, 'accounts', None):
+        return await run_pool_command(args, entry_filter)
+    if args.command == 'queue':
+        return await run_queue_command(args, entry_filter)
+
+    if args.command in ('transfer', 'download') and not args.urls and not getattr(args, 'plan', False):
+        if args.file != '-' or args.checkpoint:
+            return await run_checkpoint_command(args, entry_filter)
+        # stdin has no name to keep progress under; it runs once, without a checkpoint
+        print('Progres dari stdin tidak disimpan; gunakan --checkpoint NAMA agar bisa dilanjutkan.', file=sys.stderr)
+
+    async with open_manager() as manager:
+        if manager is None:
+            return False
+        if args.command in ('transfer', 'download', 'validate'):
+            urls = read_urls(args)
+            if not urls:
+                print(f'Tidak ada tautan berbagi; berikan tautan atau isi {args.file}.', file=sys.stderr)
+                return False
+            if args.command == 'validate':
+                reports = await manager.validate_links(urls)
+                return all(r['status'] == 'ok' for r in reports)
+            folder_id = getattr(args, 'folder_id', None) or manager.pdir_id
+            if args.command == 'transfer' and args.plan:
+                plans = await manager.plan_transfers(urls, force=args.force, entry_filter=entry_filter)
+                urls = [p['url'] for p in plans if p['fits']]
+                if not urls:
+                    return False
+            results = await manager.batch_run(urls, folder_id, download=args.command == 'download',
+                                              workers=args.workers or TRANSFER_WORKERS,
+                                              force=getattr(args, 'force', False), entry_filter=entry_filter,
+                                              incremental=getattr(args, 'incremental', False))
+            return all(r['ok'] for r in results)
+
+        folder_id = manager.pdir_id
+        if args.command == 'share':
+            url_type = 2 if args.encrypt or args.password else 1
+            if args.export:
+                return manager.export_share_results() is not None
+            store = manager.get_result_store()
+            if args.retry:
+                run_id = store.latest_run()
+                await manager.share_run_retry(run_id, url_type=url_type, expired_type=EXPIRE_OPTIONS[args.expire],
+                                              password=args.password)
+            elif args.url:
+                run_id = await manager.share_run(args.url, folder_id=folder_id, url_type=url_type,
+                                                 expired_type=EXPIRE_OPTIONS[args.expire], password=args.password,
+                                                 traverse_depth=args.depth)
+                if run_id is None:
+                    return False
+            else:
+                print('Berikan alamat folder, --retry atau --export.', file=sys.stderr)
+                return False
+            return not run_id or not store.failed(run_id)
+        if args.command == 'mkdir':
+            return await manager.create_dir(args.name)
+        if args.command == 'switch-dir':
+            ok = await manager.switch_folder(args.target)
+            if ok:
+                print(f'Direktori penyimpanan：{manager.dir_name} ({manager.pdir_id})')
+            return ok
+    return False
+
+
+async def run_checkpoint_command(args: argparse.Namespace, entry_filter) -> bool:
+    """transfer/download of the links in --file, streamed through a LinkCheckpoint so an interrupted run resumes."""
+    from ingest import LinkCheckpoint
+    from quark import TRANSFER_WORKERS
+
+    if args.file != '-' and not os.path.isfile(args.file):
+        print(f'Tidak ada tautan berbagi; berikan tautan atau isi {args.file}.', file=sys.stderr)
+        return False
+    checkpoint = LinkCheckpoint(args.file, name=args.checkpoint)
+    try:
+        if args.restart or args.retry_failed:
+            checkpoint.reset(failed_only=not args.restart)
+        elif checkpoint.offset:
+            print(f'Melanjutkan {args.file} dari byte {checkpoint.offset}', file=sys.stderr)
+        async with open_manager() as manager:
+            if manager is None:
+                return False
+            folder_id = getattr(args, 'folder_id', None) or manager.pdir_id
+            results = await manager.batch_run(checkpoint.links(), folder_id, download=args.command == 'download',
+                                              workers=args.workers or TRANSFER_WORKERS,
+                                              force=getattr(args, 'force', False), entry_filter=entry_filter,
+                                              incremental=getattr(args, 'incremental', False), checkpoint=checkpoint)
+        return not results
+    finally:
+        checkpoint.close()
+
+
+async def run_pool_command(args: argparse.Namespace, entry_filter) -> bool:
+    from accounts import AccountPool
+
+    names = None if args.command == 'accounts' or args.accounts == '*' else args.accounts.split(',')
+    pool = AccountPool(names=names)
+    if args.command == 'accounts' and args.add:
+        pool.add(args.add)
+    async with pool:
+        opened.extend(account.manager for account in pool.accounts if account.manager is not None)
+        if args.command == 'accounts':
+            return any(account.enabled for account in pool.accounts)
+        if args.command == 'transfer' and args.plan:
+            print('--plan tidak didukung bersama --accounts; ruang tiap akun dipantau otomatis.', file=sys.stderr)
+        urls = read_urls(args)
+        if not urls:
+            print(f'Tidak ada tautan berbagi; berikan tautan atau isi {args.file}.', file=sys.stderr)
+            return False
+        results = await pool.batch_run(urls, download=args.command == 'download', force=getattr(args, 'force', False),
+                                       entry_filter=entry_filter, incremental=getattr(args, 'incremental', False))
+        return all(r['ok'] for r in results)
+
+
+async def run_queue_command(args: argparse.Namespace, entry_filter) -> bool:
+    import job_queue
+
+    queue = job_queue.open_queue(args.db)
+    try:
+        if args.action in ('status', 'export', 'retry'):
+            if args.action == 'retry':
+                print(f'{queue.requeue_failed(args.batch)} tugas gagal diantrekan ulang')
+            counts = job_queue.merge_results(queue, args.batch) if args.action == 'export' else queue.counts(args.batch)
+            print('，'.join(f'{status} {n}' for status, n in counts.items()))
+            return not counts['failed']
+        if args.action == 'load':
+            from ingest import iter_urls
+
+            if not args.urls and args.file != '-' and not os.path.isfile(args.file):
+                print(f'Tidak ada tautan berbagi; berikan tautan atau isi {args.file}.', file=sys.stderr)
+                return False
+            urls = args.urls or (url for _, url in iter_urls(args.file))
+            added = queue.put(args.batch, args.kind, job_queue.link_jobs(urls))
+            print(f'{added} tautan ditambahkan ke batch {args.batch}')
+            return True
+        async with open_manager() as manager:
+            if manager is None:
+                return False
+            folder_id = getattr(args, 'folder_id', None) or manager.pdir_id
+            if args.action == 'load-share':
+                jobs = await job_queue.share_jobs(manager, args.url, args.depth,
+                                                  url_type=2 if args.encrypt or args.password else 1,
+                                                  expired_type=EXPIRE_OPTIONS[args.expire], password=args.password)
+                added = queue.put(args.batch, 'share', jobs)
+                print(f'{added} folder ditambahkan ke batch {args.batch}，{len(jobs) - added} sudah ada')
+                return True
+            options = {name: value for name, value in (('concurrency', args.concurrency),
+                                                       ('lease_timeout', args.lease)) if value}
+            stats = await job_queue.work(manager, queue, args.batch, folder_id, worker=args.worker_id,
+                                         force=args.force, entry_filter=entry_filter,
+                                         incremental=args.incremental, **options)
+            return not stats['failed']
+    finally:
+        queue.close()
+
+
+def main(argv: Union[list[str], None] = None, start: Union[float, None] = None) -> int:
+    """Runs one command; `start` is the perf_counter() of process start when an entry point such as quark.py
+    imported this module late."""
+    start = START if start is None else start
+    args = build_parser().parse_args(argv)
+    if args.command == 'daemon':
+        from daemon import main as daemon_main
+
+        try:
+            return 0 if asyncio.run(daemon_main(args.host, args.port, args.socket, args.workers)) else 1
+        except KeyboardInterrupt:
+            return 0
+
+    import quark  # noqa: F401
+
+    imported = time.perf_counter()
+    ok = asyncio.run(run_command(args))
+    if args.timing:
+        first_response = min((m.first_response_at for m in opened if m.first_response_at is not None), default=None)
+        first = f'{(first_response - start) * 1000:.0f} ms' if first_response is not None else '-'
+        print(f'[timing] impor {(imported - start) * 1000:.0f} ms，respons API pertama {first}，'
+              f'total {(time.perf_counter() - start) * 1000:.0f} ms', file=sys.stderr)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Union
+
+from cli import open_manager
+from filters import build_filter
+from quark import TRANSFER_WORKERS, QuarkPanFileManager
+from utils import custom_print
+
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = 8765
+DAEMON_WORKERS = 2  # jobs run at the same time
+JOB_HISTORY = 200  # finished jobs kept for status queries
+JOB_KINDS = ('transfer', 'download', 'share', 'mkdir', 'validate')
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    params: dict[str, Any]
+    status: str = 'queued'  # queued, running, done, failed, cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: Union[float, None] = None
+    finished_at: Union[float, None] = None
+    result: Any = None
+    error: str = ''
+    task: Union[asyncio.Task, None] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {'id': self.id, 'kind': self.kind, 'params': self.params, 'status': self.status,
+                'created_at': self.created_at, 'started_at': self.started_at, 'finished_at': self.finished_at,
+                'result': self.result, 'error': self.error}
+
+
+class JobDaemon:
+    """Runs transfer, download, share, mkdir and validate jobs on one warm QuarkPanFileManager.
+
+    Jobs are submitted over a small local HTTP API:
+
+        POST   /jobs        {"kind": "transfer", "urls": [...], ...}  -> job
+        GET    /jobs                                                   -> all jobs
+        GET    /jobs/<id>                                              -> job
+        DELETE /jobs/<id>                                              -> cancels a queued or running job
+    """
+
+    def __init__(self, manager: QuarkPanFileManager, folder_id: str, workers: int = DAEMON_WORKERS) -> None:
+        self.manager = manager
+        self.folder_id = folder_id
+        self.workers = max(1, workers)
+        self.jobs: dict[int, Job] = {}
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._ids = itertools.count(1)
+        self._tasks: list[asyncio.Task] = []
+
+    def submit(self, kind: str, params: dict[str, Any]) -> Job:
+        if kind not in JOB_KINDS:
+            raise ValueError(f'jenis tugas tidak dikenal：{kind}')
+        if kind in ('transfer', 'download', 'validate') and not params.get('urls'):
+            raise ValueError('urls wajib diisi')
+        if kind == 'share' and not params.get('url'):
+            raise ValueError('url wajib diisi')
+        if kind == 'mkdir' and not params.get('name'):
+            raise ValueError('name wajib diisi')
+        job = Job(next(self._ids), kind, params)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        self._prune()
+        return job
+
+    def cancel(self, job: Job) -> None:
+        if job.status == 'queued':
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+        elif job.status == 'running' and job.task is not None:
+            job.task.cancel()
+
+    def _prune(self) -> None:
+        finished = [job for job in self.jobs.values() if job.finished_at is not None]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job.id]
+
+    async def execute(self, job: Job) -> Any:
+        m, p = self.manager, job.params
+        folder_id = p.get('folder_id') or self.folder_id
+        entry_filter = build_filter(**p.get('filter', {}))
+        if job.kind in ('transfer', 'download'):
+            results = await m.batch_run(p['urls'], folder_id, download=job.kind == 'download',
+                                        workers=int(p.get('workers', TRANSFER_WORKERS)), force=bool(p.get('force')),
+                                        entry_filter=entry_filter, incremental=bool(p.get('incremental')))
+            return {'ok': sum(r['ok'] for r in results), 'failed': [r for r in results if not r['ok']]}
+        if job.kind == 'share':
+            run_id = await m.share_run(p['url'], folder_id=folder_id,
+                                       url_type=2 if p.get('encrypt') or p.get('password') else 1,
+                                       expired_type=int(p.get('expired_type', 1)), password=p.get('password', ''),
+                                       traverse_depth=int(p.get('depth', 0)))
+            return {'run_id': run_id, 'counts': m.get_result_store().counts(run_id) if run_id else {}}
+        if job.kind == 'mkdir':
+            json_data = await m.request_create_dir(p.get('pdir_fid', '0'), p['name'])
+            if json_data['code'] != 0:
+                raise RuntimeError(json_data.get('message', json_data['code']))
+            return {'fid': json_data['data']['fid']}
+        reports = await m.validate_links(p['urls'])
+        return {'reports': reports}
+
+    async def _worker(self) -> None:
+        while True:
+            job: Job = await self.queue.get()
+            if job.status != 'queued':
+                continue
+            job.status = 'running'
+            job.started_at = time.time()
+            job.task = asyncio.create_task(self.execute(job))
+            try:
+                job.result = await job.task
+                job.status = 'done'
+            except asyncio.CancelledError:
+                job.status = 'cancelled'
+                if asyncio.current_task().cancelling():
+                    # the daemon itself is shutting down
+                    raise
+            except Exception as e:
+                job.status = 'failed'
+                job.error = f'{type(e).__name__}: {e}'
+            finally:
+                job.finished_at = time.time()
+                job.task = None
+            custom_print(f'Tugas {job.id} ({job.kind})：{job.status} {job.error}'.rstrip())
+
+    def route(self, method: str, path: str, body: dict[str, Any]) -> tuple[int, Any]:
+        parts = [part for part in path.split('?')[0].split('/') if part]
+        if parts[:1] != ['jobs']:
+            return 404, {'error': 'not found'}
+        if len(parts) == 1:
+            if method == 'GET':
+                return 200, [job.to_dict() for job in self.jobs.values()]
+            if method == 'POST':
+                try:
+                    job = self.submit(body.get('kind', ''), body)
+                except (ValueError, TypeError) as e:
+                    return 400, {'error': str(e)}
+                return 201, job.to_dict()
+            return 405, {'error': 'method not allowed'}
+        job = self.jobs.get(int(parts[1])) if parts[1].isdigit() else None
+        if job is None:
+            return 404, {'error': 'job not found'}
+        if method == 'GET':
+            return 200, job.to_dict()
+        if method == 'DELETE':
+            self.cancel(job)
+            return 200, job.to_dict()
+        return 405, {'error': 'method not allowed'}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            raw = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+            if len(request_line) < 2:
+                status, payload = 400, {'error': 'bad request'}
+            else:
+                try:
+                    body = json.loads(raw) if raw else {}
+                    status, payload = self.route(request_line[0].upper(), request_line[1],
+                                                 body if isinstance(body, dict) else {})
+                except json.JSONDecodeError:
+                    status, payload = 400, {'error': 'invalid json'}
+            data = json.dumps(payload, ensure_ascii=False).encode()
+            writer.write(f'HTTP/1.1 {status} {"OK" if status < 400 else "Error"}\r\n'
+                         f'Content-Type: application/json; charset=utf-8\r\n'
+                         f'Content-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode() + data)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DAEMON_HOST, port: int = DAEMON_PORT, socket_path: Union[str, None] = None) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if socket_path:
+            server = await asyncio.start_unix_server(self.handle, path=socket_path)
+            custom_print(f'Daemon mendengarkan di {socket_path}')
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            custom_print(f'Daemon mendengarkan di http://{host}:{port}')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def main(host: str = DAEMON_HOST, port: int = DAEMON_PORT, socket_path: Union[str, None] = None,
+               workers: int = DAEMON_WORKERS) -> bool:
+    """Serves jobs with the saved login; returns False without serving when it is missing or expired."""
+    async with open_manager() as manager:
+        if manager is None:
+            return False
+        custom_print(f'Akun {manager.user}，direktori penyimpanan {manager.dir_name}')
+        await JobDaemon(manager, manager.pdir_id, workers=workers).serve(host, port, socket_path)
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='QuarkPanTool daemon with a local job API')
+    parser.add_argument('--host', default=DAEMON_HOST)
+    parser.add_argument('--port', type=int, default=DAEMON_PORT)
+    parser.add_argument('--socket', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=DAEMON_WORKERS, help='jobs run at the same time')
+    args = parser.parse_args()
+    try:
+        sys.exit(0 if asyncio.run(main(args.host, args.port, args.socket, args.workers)) else 1)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,331 @@
+import asyncio
+import json
+import os
+import random
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Union
+
+import httpx
+
+from utils import custom_print, read_config, save_config
+
+DOWNLOAD_WORKERS = 4  # number of files downloaded at the same time
+DOWNLOAD_BYTE_BUDGET = 512 * 1024 * 1024  # bytes allowed in flight across all workers
+DOWNLOAD_RETRIES = 3  # attempts per file before it is reported as failed
+DOWNLOAD_SEGMENTS = 1  # connections per file in segmented mode, 1 keeps the single stream
+MIN_SEGMENT_SIZE = 16 * 1024 * 1024  # files are never split into ranges smaller than this
+CHECKPOINT_BYTES = 8 * 1024 * 1024  # .part progress is flushed to the sidecar every this many bytes
+PART_SUFFIX = '.part'
+MANIFEST_PATH = 'downloads/.manifest.json'
+
+
+@dataclass
+class DownloadJob:
+    fid: str
+    file_name: str
+    size: int
+    save_path: str
+    download_url: str
+    updated_at: int = 0
+    index: int = 0
+    attempts: int = 0
+    error: str = ''
+
+
+class ByteBudget:
+    """Caps the total size of the files being downloaded at the same time."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, size: int) -> int:
+        # a file larger than the whole budget still runs, it just runs alone
+        size = min(max(size, 0), self.limit)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight + size <= self.limit)
+            self.in_flight += size
+        return size
+
+    async def release(self, size: int) -> None:
+        async with self._cond:
+            self.in_flight -= size
+            self._cond.notify_all()
+
+
+def interleave_by_size(jobs: list[DownloadJob]) -> list[DownloadJob]:
+    """Alternates the largest and smallest remaining files so big transfers overlap with many small ones."""
+    ordered = sorted(jobs, key=lambda job: job.size, reverse=True)
+    result = []
+    left, right = 0, len(ordered) - 1
+    while left <= right:
+        result.append(ordered[left])
+        left += 1
+        if left <= right:
+            result.append(ordered[right])
+            right -= 1
+    return result
+
+
+class DownloadScheduler:
+    def __init__(self, fetch: Callable[[DownloadJob, int], Awaitable[None]],
+                 refresh: Union[Callable[[DownloadJob], Awaitable[None]], None] = None,
+                 workers: int = DOWNLOAD_WORKERS, byte_budget: int = DOWNLOAD_BYTE_BUDGET,
+                 retries: int = DOWNLOAD_RETRIES) -> None:
+        self.fetch = fetch
+        self.refresh = refresh
+        self.workers = max(1, workers)
+        self.budget = ByteBudget(byte_budget)
+        self.retries = retries
+        self.done: list[DownloadJob] = []
+        self.failed: list[DownloadJob] = []
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        self._submitted = 0
+
+    def submit(self, jobs: list[DownloadJob]) -> None:
+        for job in interleave_by_size(jobs):
+            self._submitted += 1
+            job.index = job.index or self._submitted
+            self._queue.put_nowait(job)
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(slot)) for slot in range(self.workers)]
+
+    async def _worker(self, slot: int) -> None:
+        while True:
+            job: DownloadJob = await self._queue.get()
+            retry = False
+            reserved = await self.budget.acquire(job.size)
+            try:
+                job.attempts += 1
+                await self.fetch(job, slot)
+                self.done.append(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.error = f'{type(e).__name__}: {e}'
+                retry = job.attempts < self.retries
+                if retry:
+                    custom_print(f'Unduhan {job.file_name} gagal ({job.error}), mencoba lagi...', error_msg=True)
+                else:
+                    custom_print(f'Unduhan {job.file_name} gagal：{job.error}', error_msg=True)
+                    self.failed.append(job)
+            finally:
+                await self.budget.release(reserved)
+            if retry:
+                # back off, then fetch a fresh download_url before the job goes back in line
+                await asyncio.sleep(min(30.0, 2 ** job.attempts) + random.random())
+                if self.refresh:
+                    try:
+                        await self.refresh(job)
+                    except Exception as e:
+                        job.error = f'{type(e).__name__}: {e}'
+                self._queue.put_nowait(job)
+            self._queue.task_done()
+
+    async def join(self) -> tuple[list[DownloadJob], list[DownloadJob]]:
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        return self.done, self.failed
+
+
+class DownloadManifest:
+    """Remembers which fid was downloaded to which path, so unchanged files can be skipped next time."""
+
+    def __init__(self, path: str = MANIFEST_PATH) -> None:
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self._unsaved = 0
+        try:
+            self.entries = read_config(path, 'json')
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            self.entries = {}
+
+    def is_current(self, fid: str, save_path: str, size: int, updated_at: int) -> bool:
+        if not os.path.isfile(save_path) or os.path.getsize(save_path) != size:
+            return False
+        record = self.entries.get(fid)
+        if record is None:
+            # downloaded before the manifest existed: trust a file of the right size and adopt it
+            self.record(fid, save_path, size, updated_at)
+            return True
+        return record['path'] == save_path and record['size'] == size and record['updated_at'] == updated_at
+
+    def record(self, fid: str, save_path: str, size: int, updated_at: int) -> None:
+        self.entries[fid] = {'path': save_path, 'size': size, 'updated_at': updated_at}
+        self._unsaved += 1
+        if self._unsaved >= 100:
+            self.save()
+
+    def save(self) -> None:
+        if not self._unsaved:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        save_config(self.path + '.tmp', json.dumps(self.entries, ensure_ascii=False))
+        os.replace(self.path + '.tmp', self.path)
+        self._unsaved = 0
+
+
+def split_ranges(size: int, segments: int, min_segment_size: int = MIN_SEGMENT_SIZE) -> list[tuple[int, int]]:
+    """Splits `size` bytes into at most `segments` inclusive (start, end) byte ranges."""
+    if size <= 0:
+        return []
+    count = max(1, min(segments, size // max(min_segment_size, 1)))
+    step = -(-size // count)
+    return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+
+async def probe_range_support(client: httpx.AsyncClient, url: str, headers: dict) -> Union[int, None]:
+    """Returns the total size if the server answers a one-byte Range request with 206, otherwise None."""
+    async with client.stream("GET", url, headers={**headers, "range": "bytes=0-0"}) as response:
+        if response.status_code != 206:
+            return None
+        match = re.match(r'bytes\s+0-0/(\d+)', response.headers.get("content-range", ""))
+        return int(match.group(1)) if match else None
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+class PartFile:
+    """A download in progress: `<save_path>.part` plus a JSON sidecar recording what has been written."""
+
+    def __init__(self, save_path: str, fid: str, size: int) -> None:
+        self.save_path = save_path
+        self.path = save_path + PART_SUFFIX
+        self.meta_path = self.path + '.json'
+        self.fid = fid
+        self.size = size
+        self.segments: list[list[int]] = []
+
+    @property
+    def written(self) -> int:
+        return sum(segment[2] for segment in self.segments)
+
+    def load(self) -> bool:
+        """Restores the segment progress of an earlier run, if it belongs to the same file."""
+        if not self.size or not os.path.exists(self.path):
+            return False
+        try:
+            meta = read_config(self.meta_path, 'json')
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return False
+        if meta.get('fid') != self.fid or meta.get('size') != self.size or os.path.getsize(self.path) != self.size:
+            return False
+        self.segments = [list(segment) for segment in meta.get('segments', [])]
+        return bool(self.segments)
+
+    def create(self, ranges: list[tuple[int, int]]) -> None:
+        self.segments = [[start, end, 0] for start, end in ranges]
+        with open(self.path, "wb") as f:
+            f.truncate(self.size)
+        self.save()
+
+    def save(self) -> None:
+        meta = {'fid': self.fid, 'size': self.size, 'written': self.written, 'segments': self.segments}
+        save_config(self.meta_path + '.tmp', json.dumps(meta))
+        os.replace(self.meta_path + '.tmp', self.meta_path)
+
+    def complete(self) -> None:
+        os.replace(self.path, self.save_path)
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+
+async def fetch_segment(client: httpx.AsyncClient, url: str, headers: dict, part: PartFile, segment: list[int],
+                        on_progress: Callable[[int], None]) -> None:
+    start, end, written = segment
+    offset = start + written
+    if offset > end:
+        return
+    # a fresh whole-file download needs no Range header, so it also works where ranges are unsupported
+    whole_file = offset == 0 and end == part.size - 1
+    request_headers = headers if whole_file else {**headers, "range": f"bytes={offset}-{end}"}
+    async with client.stream("GET", url, headers=request_headers) as response:
+        if not (response.status_code == 206 or whole_file and response.status_code == 200):
+            if response.status_code == 200:
+                raise RangeNotSupported(url)
+            response.raise_for_status()
+            raise httpx.HTTPStatusError(f'HTTP {response.status_code}', request=response.request, response=response)
+        with open(part.path, "r+b") as f:
+            f.seek(offset)
+            unsaved = 0
+            try:
+                async for chunk in response.aiter_bytes():
+                    chunk = chunk[:end + 1 - offset]
+                    f.write(chunk)
+                    offset += len(chunk)
+                    unsaved += len(chunk)
+                    on_progress(len(chunk))
+                    if unsaved >= CHECKPOINT_BYTES:
+                        f.flush()
+                        os.fsync(f.fileno())
+                        segment[2] = offset - start
+                        part.save()
+                        unsaved = 0
+                    if offset > end:
+                        break
+            finally:
+                f.flush()
+                os.fsync(f.fileno())
+                segment[2] = offset - start
+                part.save()
+    if offset != end + 1:
+        raise httpx.ReadError(f'Range {start}-{end} terputus pada byte {offset}')
+
+
+async def download_to_file(client: httpx.AsyncClient, url: str, headers: dict, save_path: str, fid: str, size: int,
+                           segments: int = DOWNLOAD_SEGMENTS, min_segment_size: int = MIN_SEGMENT_SIZE,
+                           on_progress: Callable[[int], None] = lambda n: None) -> None:
+    """Downloads `url` into `<save_path>.part` and moves it into place once it is complete.
+
+    With a known size the progress is kept in a sidecar, so an interrupted download continues
+    from the last confirmed offset of each segment (a fresh `url` may be used). With
+    `segments` > 1 and Range support the file is fetched over several connections at once.
+    """
+    part = PartFile(save_path, fid, size)
+
+    if not size:
+        # unknown size: nothing to resume against, stream the whole body
+        async with client.stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+            with open(part.path, "wb") as f:
+                async for chunk in response.aiter_bytes():
+                    f.write(chunk)
+                    on_progress(len(chunk))
+        part.complete()
+        return
+
+    if part.load():
+        custom_print(f'Melanjutkan unduhan {os.path.basename(save_path)} dari {part.written} byte')
+        on_progress(part.written)
+    else:
+        ranges = [(0, size - 1)]
+        if segments > 1 and size >= 2 * min_segment_size and await probe_range_support(client, url, headers) == size:
+            ranges = split_ranges(size, segments, min_segment_size)
+        part.create(ranges)
+
+    tasks = [asyncio.create_task(fetch_segment(client, url, headers, part, segment, on_progress))
+             for segment in part.segments]
+    try:
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # stop the sibling segments before the .part file is reused or abandoned
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    except RangeNotSupported:
+        # the server ignored Range, so start over with one plain stream
+        custom_print(f'Server tidak mendukung Range, mengunduh ulang {os.path.basename(save_path)}', error_msg=True)
+        on_progress(-part.written)
+        part.create([(0, size - 1)])
+        await fetch_segment(client, url, headers, part, part.segments[0], on_progress)
+    part.complete()
@@ -0,0 +1,128 @@
+import time
+from typing import Any, Iterable, Union
+
+from quark_login import CONFIG_DIR
+from store import connect
+
+DRIVE_INDEX_DB = f'{CONFIG_DIR}/drive_index.db'
+ROOT_FID = '0'
+INDEX_MAX_AGE = 6 * 3600  # seconds after which a folder is listed again even if its updated_at looks unchanged
+
+
+class DriveIndex:
+    """Local copy of the cloud drive tree.
+
+    `nodes` holds every listed entry in listing order; `listings` remembers the `updated_at` a
+    folder had when its children were last listed, so a refresh can skip folders that did not change.
+    A change deep in the tree is only seen once its parent is listed again, so listings also expire
+    after `max_age` seconds.
+    """
+
+    def __init__(self, path: str = DRIVE_INDEX_DB, max_age: float = INDEX_MAX_AGE) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.conn = connect(path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS nodes (
+                fid TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                pos INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                dir INTEGER NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                updated_at INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS nodes_parent ON nodes (parent, pos);
+            CREATE TABLE IF NOT EXISTS listings (
+                fid TEXT PRIMARY KEY,
+                updated_at INTEGER NOT NULL,
+                listed_at INTEGER NOT NULL
+            );
+        ''')
+        self.conn.commit()
+
+    def is_current(self, fid: str, updated_at: int) -> bool:
+        """Whether the indexed children of `fid` can be trusted for a folder now reporting `updated_at`."""
+        row = self.conn.execute('SELECT updated_at, listed_at FROM listings WHERE fid = ?', (fid,)).fetchone()
+        return row is not None and row[0] == updated_at and time.time() - row[1] < self.max_age
+
+    def replace_children(self, pdir_fid: str, items: Iterable[dict[str, Any]], updated_at: int) -> None:
+        rows = [(i['fid'], pdir_fid, pos, i['file_name'], int(bool(i['dir'])), i.get('size', 0) or 0,
+                 i.get('updated_at', 0) or 0) for pos, i in enumerate(items)]
+        fids = {row[0] for row in rows}
+        with self.conn:
+            gone = [fid for fid, in self.conn.execute('SELECT fid FROM nodes WHERE parent = ? AND dir = 1',
+                                                      (pdir_fid,)) if fid not in fids]
+            # folders that disappeared (or moved) drop their whole indexed subtree
+            for fid in gone:
+                self.conn.execute('''
+                    WITH RECURSIVE subtree(fid) AS (
+                        VALUES (?) UNION SELECT nodes.fid FROM nodes JOIN subtree ON nodes.parent = subtree.fid
+                    )
+                    DELETE FROM listings WHERE fid IN subtree''', (fid,))
+                self.conn.execute('''
+                    WITH RECURSIVE subtree(fid) AS (
+                        VALUES (?) UNION SELECT nodes.fid FROM nodes JOIN subtree ON nodes.parent = subtree.fid
+                    )
+                    DELETE FROM nodes WHERE parent IN subtree''', (fid,))
+            self.conn.execute('DELETE FROM nodes WHERE parent = ?', (pdir_fid,))
+            self.conn.executemany('INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self.conn.execute('INSERT OR REPLACE INTO listings VALUES (?, ?, ?)',
+                              (pdir_fid, updated_at, int(time.time())))
+
+    def add_folder(self, fid: str, name: str, pdir_fid: str = ROOT_FID, updated_at: int = 0) -> None:
+        with self.conn:
+            pos = self.conn.execute('SELECT COALESCE(MAX(pos), -1) + 1 FROM nodes WHERE parent = ?',
+                                    (pdir_fid,)).fetchone()[0]
+            self.conn.execute('INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?, 1, 0, ?)',
+                              (fid, pdir_fid, pos, name, updated_at))
+
+    def invalidate(self, fid: str) -> None:
+        """Forces the next refresh to list `fid` again."""
+        with self.conn:
+            self.conn.execute('DELETE FROM listings WHERE fid = ?', (fid,))
+
+    def get(self, fid: str) -> Union[dict[str, Any], None]:
+        row = self.conn.execute('SELECT fid, parent, name, dir, size, updated_at FROM nodes WHERE fid = ?',
+                                (fid,)).fetchone()
+        return dict(zip(('fid', 'parent', 'file_name', 'dir', 'size', 'updated_at'), row)) if row else None
+
+    def children(self, pdir_fid: str, dirs_only: bool = False) -> list[dict[str, Any]]:
+        query = 'SELECT fid, name, dir, size, updated_at FROM nodes WHERE parent = ?'
+        if dirs_only:
+            query += ' AND dir = 1'
+        rows = self.conn.execute(query + ' ORDER BY pos', (pdir_fid,))
+        return [dict(zip(('fid', 'file_name', 'dir', 'size', 'updated_at'), row)) for row in rows]
+
+    def resolve(self, path: str, root_fid: str = ROOT_FID) -> Union[str, None]:
+        """fid of the folder at `a/b/c` below `root_fid`, None if the index does not know it."""
+        fid = root_fid
+        for name in filter(None, path.strip('/').split('/')):
+            row = self.conn.execute('SELECT fid FROM nodes WHERE parent = ? AND name = ? AND dir = 1',
+                                    (fid, name)).fetchone()
+            if row is None:
+                return None
+            fid = row[0]
+        return fid
+
+    def path_of(self, fid: str) -> str:
+        names = []
+        while fid != ROOT_FID and (row := self.conn.execute('SELECT parent, name FROM nodes WHERE fid = ?',
+                                                            (fid,)).fetchone()):
+            fid, name = row
+            names.append(name)
+        return '/'.join(reversed(names))
+
+    def folders_at_depth(self, root_fid: str, depth: int) -> list[tuple[tuple[str, ...], str]]:
+        """`(path, fid)` of every folder exactly `depth` levels below `root_fid`, in listing order."""
+        level: list[tuple[tuple[str, ...], str]] = [((), root_fid)]
+        for _ in range(depth):
+            level = [(path + (i['file_name'],), i['fid']) for path, fid in level
+                     for i in self.children(fid, dirs_only=True)]
+        return level
+
+    def __len__(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM nodes').fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
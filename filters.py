@@ -0,0 +1,112 @@
+import fnmatch
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Union
+
+from models import FileEntry
+
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2, 'G': 1024 ** 3, 'GB': 1024 ** 3,
+              'T': 1024 ** 4, 'TB': 1024 ** 4}
+
+
+def parse_size(text: str) -> int:
+    """`1.5G`, `500MB`, `2048` -> bytes."""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([a-zA-Z]*)\s*', text)
+    if not match or match.group(2).upper() not in SIZE_UNITS:
+        raise ValueError(f'ukuran tidak valid：{text}')
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def parse_date(text: str) -> int:
+    """`YYYY-MM-DD` (local time) -> unix seconds."""
+    return int(datetime.strptime(text.strip(), '%Y-%m-%d').timestamp())
+
+
+def compile_pattern(pattern: str) -> re.Pattern:
+    """`re:<regex>` is used as is, anything else is a case-insensitive glob."""
+    if pattern.startswith('re:'):
+        return re.compile(pattern[3:], re.IGNORECASE)
+    return re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+
+
+@dataclass
+class EntryFilter:
+    """Selects share entries by name, extension, size and modification time.
+
+    `exclude` applies to folders too, and an excluded folder is never listed. All other
+    criteria only select files; folders are walked as long as they are not excluded.
+    """
+
+    include: list[str] = field(default_factory=list)
+    exclude: list[str] = field(default_factory=list)
+    extensions: set[str] = field(default_factory=set)
+    min_size: int = 0
+    max_size: Union[int, None] = None
+    modified_after: Union[int, None] = None  # unix seconds
+    modified_before: Union[int, None] = None
+    _include: list[re.Pattern] = field(init=False, repr=False)
+    _exclude: list[re.Pattern] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.extensions = {ext.lower().lstrip('.') for ext in self.extensions}
+        self._include = [compile_pattern(p) for p in self.include]
+        self._exclude = [compile_pattern(p) for p in self.exclude]
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude or self.extensions or self.min_size or self.max_size is not None
+                    or self.modified_after is not None or self.modified_before is not None)
+
+    def walk_folder(self, entry: FileEntry) -> bool:
+        return not any(p.match(entry.file_name) for p in self._exclude)
+
+    def match_file(self, entry: FileEntry) -> bool:
+        name = entry.file_name
+        if any(p.match(name) for p in self._exclude):
+            return False
+        if self._include and not any(p.match(name) for p in self._include):
+            return False
+        if self.extensions and name.rsplit('.', 1)[-1].lower() not in self.extensions:
+            return False
+        if entry.size < self.min_size or self.max_size is not None and entry.size > self.max_size:
+            return False
+        # the API reports updated_at in milliseconds
+        modified = entry.updated_at // 1000 if entry.updated_at > 10 ** 11 else entry.updated_at
+        if self.modified_after is not None and modified < self.modified_after:
+            return False
+        if self.modified_before is not None and modified >= self.modified_before:
+            return False
+        return True
+
+    def __call__(self, entry: FileEntry) -> bool:
+        return self.walk_folder(entry) if entry.dir else self.match_file(entry)
+
+    def apply(self, page: list[FileEntry]) -> list[FileEntry]:
+        return [entry for entry in page if self(entry)]
+
+
+def build_filter(include: Union[str, list[str], None] = None, exclude: Union[str, list[str], None] = None,
+                 extensions: Union[str, list[str], None] = None, min_size: Union[str, int, None] = None,
+                 max_size: Union[str, int, None] = None, modified_after: Union[str, int, None] = None,
+                 modified_before: Union[str, int, None] = None) -> Union[EntryFilter, None]:
+    """EntryFilter from loose options (comma separated strings, `1G` sizes, `YYYY-MM-DD` dates); None if all are empty."""
+
+    def split(value: Union[str, list[str], None]) -> list[str]:
+        if isinstance(value, str):
+            value = value.split(',')
+        return [part.strip() for part in value or [] if part.strip()]
+
+    def size(value: Union[str, int, None]) -> Union[int, None]:
+        if isinstance(value, str):
+            return parse_size(value) if value.strip() else None
+        return value
+
+    def date(value: Union[str, int, None]) -> Union[int, None]:
+        if isinstance(value, str):
+            return parse_date(value) if value.strip() else None
+        return value
+
+    entry_filter = EntryFilter(include=split(include), exclude=split(exclude), extensions=set(split(extensions)),
+                               min_size=size(min_size) or 0, max_size=size(max_size),
+                               modified_after=date(modified_after), modified_before=date(modified_before))
+    return entry_filter if entry_filter else None
@@ -0,0 +1,166 @@
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Iterator, Union
+
+from quark_login import CONFIG_DIR
+from store import connect
+from utils import parse_share_url
+
+INGEST_DB = f'{CONFIG_DIR}/ingest.db'
+CHECKPOINT_BATCH = 20  # finished links written before the checkpoint is committed
+URL_PATTERN = re.compile(r'https?://\S+')
+
+
+def open_source(source: str) -> BinaryIO:
+    return sys.stdin.buffer if source == '-' else open(source, 'rb')
+
+
+def iter_urls(source: str, start: int = 0) -> Iterator[tuple[int, str]]:
+    """Yields `(offset, url)` for the links in `source` (a path, or `-` for stdin) one line at a time,
+    beginning at byte `start`; `offset` is the byte position right after the link's line."""
+    f = open_source(source)
+    try:
+        offset = 0
+        if start and f.seekable():
+            # a file rewritten shorter than the checkpoint is read again from the start
+            if f.seek(0, os.SEEK_END) >= start:
+                offset = f.seek(start)
+            else:
+                f.seek(0)
+        elif start:
+            for raw in f:
+                offset += len(raw)
+                if offset >= start:
+                    break
+        for raw in f:
+            offset += len(raw)
+            for url in URL_PATTERN.findall(raw.decode('utf-8', errors='replace')):
+                yield offset, url
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+
+
+def count_urls(source: str) -> int:
+    return sum(1 for _ in iter_urls(source))
+
+
+class LinkCheckpoint:
+    """Durable progress through one link source.
+
+    Stores the byte offset up to which every link has finished, and the outcome of every finished
+    share by pwd_id, keyed by the absolute path of the source or by an explicit `name` (required for
+    stdin, which has no identity of its own). links() resumes at that offset and skips shares that
+    already finished or are still running, so a link list of any size is read once, deduplicated and
+    resumed in constant memory. A link that is never passed to done() (for example because the drive filled up) keeps
+    the offset in front of it, so the next run tries it again.
+    """
+
+    def __init__(self, source: str, name: Union[str, None] = None, path: str = INGEST_DB,
+                 batch_size: int = CHECKPOINT_BATCH) -> None:
+        if source == '-' and not name:
+            raise ValueError('checkpoint untuk stdin memerlukan nama')
+        self.input = source
+        self.source = f'name:{name}' if name else os.path.abspath(source)
+        self.batch_size = batch_size
+        self.conn = connect(path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS sources (
+                source TEXT PRIMARY KEY,
+                offset INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS links (
+                source TEXT NOT NULL,
+                pwd_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                url TEXT NOT NULL,
+                error TEXT NOT NULL DEFAULT '',
+                updated_at INTEGER NOT NULL,
+                PRIMARY KEY (source, pwd_id)
+            );
+        ''')
+        self.conn.commit()
+        row = self.conn.execute('SELECT offset FROM sources WHERE source = ?', (self.source,)).fetchone()
+        self.offset = row[0] if row else 0
+        self._lines: OrderedDict[int, list] = OrderedDict()  # seq -> [end offset, finished], in file order
+        self._running: dict[str, int] = {}  # pwd_id -> seq
+        self._seq = 0
+        self._unsaved = 0
+
+    def status(self, pwd_id: str) -> Union[str, None]:
+        row = self.conn.execute('SELECT status FROM links WHERE source = ? AND pwd_id = ?',
+                                (self.source, pwd_id)).fetchone()
+        return row[0] if row else None
+
+    def _append(self, offset: int, finished: bool) -> int:
+        last = next(reversed(self._lines.values()), None)
+        if finished and last is not None and last[1]:
+            # runs of skipped links share one entry, so skipping never grows memory
+            last[0] = offset
+            return -1
+        self._seq += 1
+        self._lines[self._seq] = [offset, finished]
+        return self._seq
+
+    def _advance(self) -> None:
+        moved = False
+        while self._lines:
+            seq, (offset, finished) = next(iter(self._lines.items()))
+            if not finished:
+                break
+            del self._lines[seq]
+            self.offset, moved = offset, True
+        if moved:
+            self.conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?)',
+                              (self.source, self.offset, int(time.time())))
+
+    def links(self) -> Iterator[str]:
+        """The links still to do, in file order, each share once."""
+        for offset, url in iter_urls(self.input, self.offset):
+            pwd_id = parse_share_url(url)[0]
+            if not pwd_id or pwd_id in self._running or self.status(pwd_id) is not None:
+                self._append(offset, True)
+                self._advance()
+                continue
+            self._running[pwd_id] = self._append(offset, False)
+            yield url.strip()
+
+    def done(self, url: str, ok: bool, error: str = '') -> None:
+        """Records the outcome of a link from links() and moves the checkpoint past every finished line."""
+        pwd_id = parse_share_url(url)[0]
+        seq = self._running.pop(pwd_id, None)
+        if seq is None:
+            return
+        self._lines[seq][1] = True
+        self.conn.execute('INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?, ?, ?)',
+                          (self.source, pwd_id, 'ok' if ok else 'failed', url, error, int(time.time())))
+        self._advance()
+        self._unsaved += 1
+        if self._unsaved >= self.batch_size:
+            self.commit()
+
+    def commit(self) -> None:
+        self.conn.commit()
+        self._unsaved = 0
+
+    def counts(self) -> dict[str, int]:
+        rows = self.conn.execute('SELECT status, COUNT(*) FROM links WHERE source = ? GROUP BY status', (self.source,))
+        return dict(rows.fetchall())
+
+    def reset(self, failed_only: bool = False) -> None:
+        """Starts the source over; with `failed_only` finished shares stay skipped and only failed ones run again."""
+        with self.conn:
+            if failed_only:
+                self.conn.execute("DELETE FROM links WHERE source = ? AND status = 'failed'", (self.source,))
+            else:
+                self.conn.execute('DELETE FROM links WHERE source = ?', (self.source,))
+            self.conn.execute('DELETE FROM sources WHERE source = ?', (self.source,))
+        self.offset = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.conn.close()
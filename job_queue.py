@@ -0,0 +1,451 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Union
+
+from filters import EntryFilter
+from store import ResultStore
+from utils import custom_print, parse_share_url
+
+JOB_QUEUE_DB = 'share/queue.db'  # put it on a volume every worker host can reach
+LEASE_TIMEOUT = 300.0  # seconds a leased job belongs to a worker without a heartbeat
+HEARTBEAT_INTERVAL = 60.0  # seconds between two lease renewals of a worker
+QUEUE_POLL_INTERVAL = 5.0  # seconds an idle worker waits before asking for jobs again
+MAX_ATTEMPTS = 3  # leases per job before it is marked failed
+QUEUE_WORKERS = 4  # jobs one worker process runs at the same time
+QUEUE_REPORT = 'share/queue_report.txt'
+JOB_KINDS = ('transfer', 'download', 'share')
+
+
+def check_kind(kind: str) -> None:
+    if kind not in JOB_KINDS:
+        raise ValueError(f'jenis tugas tidak dikenal：{kind}')
+
+
+@dataclass
+class QueueJob:
+    id: int
+    batch: str
+    kind: str  # transfer, download, share
+    key: str  # pwd_id of a link or fid of a folder; unique within batch and kind
+    payload: dict[str, Any]
+    status: str = 'queued'  # queued, leased, done, failed
+    worker: str = ''
+    lease_until: float = 0.0
+    attempts: int = 0
+    result: dict[str, Any] = field(default_factory=dict)
+    error: str = ''
+
+
+class JobQueue(ABC):
+    """Jobs of named batches that several workers lease, renew and complete.
+
+    A lease ends with complete(); a worker that stops renewing it loses the job once
+    `lease_until` passes, and the job is queued again (up to MAX_ATTEMPTS leases).
+    Implementations are thread-safe, so work() can call them off the event loop.
+    """
+
+    @abstractmethod
+    def put(self, batch: str, kind: str, jobs: Iterable[tuple[str, dict[str, Any]]]) -> int:
+        """Adds `(key, payload)` jobs, skipping keys the batch already has; returns how many were added."""
+        ...
+
+    @abstractmethod
+    def lease(self, batch: str, worker: str, limit: int = 1, timeout: float = LEASE_TIMEOUT) -> list[QueueJob]:
+        ...
+
+    @abstractmethod
+    def heartbeat(self, worker: str, ids: Iterable[int], timeout: float = LEASE_TIMEOUT) -> set[int]:
+        """Extends the worker's leases on `ids` and returns the ids it still holds."""
+        ...
+
+    @abstractmethod
+    def complete(self, job_id: int, worker: str, ok: bool, result: Union[dict[str, Any], None] = None,
+                 error: str = '', retry: bool = False) -> bool:
+        """Records the outcome of a leased job; with `retry` a failure is queued again while attempts remain.
+
+        Returns False if the lease had already expired and the outcome was dropped.
+        """
+        ...
+
+    @abstractmethod
+    def jobs(self, batch: str) -> list[QueueJob]:
+        ...
+
+    @abstractmethod
+    def requeue_failed(self, batch: str) -> int:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def counts(self, batch: str) -> dict[str, int]:
+        counts = {'queued': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        for job in self.jobs(batch):
+            counts[job.status] += 1
+        return counts
+
+
+class MemoryQueue(JobQueue):
+    """In-process stand-in for SQLiteQueue: same semantics, nothing shared with other hosts."""
+
+    def __init__(self) -> None:
+        self._jobs: dict[int, QueueJob] = {}
+        self._keys: set[tuple[str, str, str]] = set()
+        self.lock = threading.Lock()
+
+    def put(self, batch: str, kind: str, jobs: Iterable[tuple[str, dict[str, Any]]]) -> int:
+        with self.lock:
+            check_kind(kind)
+            added = 0
+            for key, payload in jobs:
+                if (batch, kind, key) in self._keys:
+                    continue
+                self._keys.add((batch, kind, key))
+                job_id = len(self._jobs) + 1
+                self._jobs[job_id] = QueueJob(job_id, batch, kind, key, dict(payload))
+                added += 1
+            return added
+
+    def _expire(self, now: float) -> None:
+        for job in self._jobs.values():
+            if job.status == 'leased' and job.lease_until < now:
+                job.status = 'queued' if job.attempts < MAX_ATTEMPTS else 'failed'
+                job.error = 'lease kedaluwarsa'
+                job.worker = ''
+
+    def lease(self, batch: str, worker: str, limit: int = 1, timeout: float = LEASE_TIMEOUT) -> list[QueueJob]:
+        with self.lock:
+            now = time.time()
+            self._expire(now)
+            leased = []
+            for job in self._jobs.values():
+                if len(leased) >= limit:
+                    break
+                if job.batch == batch and job.status == 'queued':
+                    job.status, job.worker, job.lease_until = 'leased', worker, now + timeout
+                    job.attempts += 1
+                    leased.append(job)
+            return leased
+
+    def heartbeat(self, worker: str, ids: Iterable[int], timeout: float = LEASE_TIMEOUT) -> set[int]:
+        with self.lock:
+            now = time.time()
+            held = set()
+            for job_id in ids:
+                job = self._jobs.get(job_id)
+                if job is not None and job.status == 'leased' and job.worker == worker and job.lease_until >= now:
+                    job.lease_until = now + timeout
+                    held.add(job_id)
+            return held
+
+    def complete(self, job_id: int, worker: str, ok: bool, result: Union[dict[str, Any], None] = None,
+                 error: str = '', retry: bool = False) -> bool:
+        with self.lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != 'leased' or job.worker != worker:
+                return False
+            if ok:
+                job.status = 'done'
+            else:
+                job.status = 'queued' if retry and job.attempts < MAX_ATTEMPTS else 'failed'
+            job.result, job.error = result or {}, error
+            if job.status == 'queued':
+                job.worker = ''
+            return True
+
+    def jobs(self, batch: str) -> list[QueueJob]:
+        with self.lock:
+            self._expire(time.time())
+            return [job for job in self._jobs.values() if job.batch == batch]
+
+    def requeue_failed(self, batch: str) -> int:
+        with self.lock:
+            failed = [job for job in self._jobs.values() if job.batch == batch and job.status == 'failed']
+            for job in failed:
+                job.status, job.attempts, job.error = 'queued', 0, ''
+            return len(failed)
+
+
+class SQLiteQueue(JobQueue):
+    """JobQueue in one SQLite file that every worker host opens.
+
+    WAL needs shared memory between the processes, which hosts on a network volume do not
+    have, so this file keeps the rollback journal; every lease runs in a BEGIN IMMEDIATE
+    transaction, so two workers never take the same job.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_DB) -> None:
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # work() runs queue calls in worker threads; the lock keeps them one at a time on the connection
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=DELETE')
+        self.conn.execute('PRAGMA synchronous=FULL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                batch TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                worker TEXT NOT NULL DEFAULT '',
+                lease_until REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT NOT NULL DEFAULT '{}',
+                error TEXT NOT NULL DEFAULT '',
+                updated_at REAL NOT NULL,
+                UNIQUE (batch, kind, key)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (batch, status, id);
+        ''')
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    @staticmethod
+    def _row(row: tuple) -> QueueJob:
+        job_id, batch, kind, key, payload, status, worker, lease_until, attempts, result, error = row
+        return QueueJob(job_id, batch, kind, key, json.loads(payload), status, worker, lease_until, attempts,
+                        json.loads(result), error)
+
+    def put(self, batch: str, kind: str, jobs: Iterable[tuple[str, dict[str, Any]]]) -> int:
+        check_kind(kind)
+        now = time.time()
+        rows = ((batch, kind, key, json.dumps(payload, ensure_ascii=False), now) for key, payload in jobs)
+        with self.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO jobs (batch, kind, key, payload, updated_at) VALUES (?, ?, ?, ?, ?)',
+                             rows)
+            return conn.total_changes - before
+
+    @staticmethod
+    def _expire(conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END, "
+                     "worker = '', error = 'lease kedaluwarsa', updated_at = ? "
+                     "WHERE status = 'leased' AND lease_until < ?", (MAX_ATTEMPTS, now, now))
+
+    def lease(self, batch: str, worker: str, limit: int = 1, timeout: float = LEASE_TIMEOUT) -> list[QueueJob]:
+        now = time.time()
+        with self.transaction() as conn:
+            self._expire(conn, now)
+            ids = [job_id for job_id, in conn.execute(
+                "SELECT id FROM jobs WHERE batch = ? AND status = 'queued' ORDER BY id LIMIT ?", (batch, limit))]
+            if not ids:
+                return []
+            conn.executemany("UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                             "updated_at = ? WHERE id = ?", [(worker, now + timeout, now, job_id) for job_id in ids])
+            rows = conn.execute(f"SELECT id, batch, kind, key, payload, status, worker, lease_until, attempts, result, "
+                                f"error FROM jobs WHERE id IN ({','.join('?' * len(ids))}) ORDER BY id", ids).fetchall()
+        return [self._row(row) for row in rows]
+
+    def heartbeat(self, worker: str, ids: Iterable[int], timeout: float = LEASE_TIMEOUT) -> set[int]:
+        ids = list(ids)
+        if not ids:
+            return set()
+        now = time.time()
+        marks = ','.join('?' * len(ids))
+        with self.transaction() as conn:
+            conn.execute(f"UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id IN ({marks}) AND status = 'leased' "
+                         f"AND worker = ? AND lease_until >= ?", (now + timeout, now, *ids, worker, now))
+            return {job_id for job_id, in conn.execute(
+                f"SELECT id FROM jobs WHERE id IN ({marks}) AND status = 'leased' AND worker = ?", (*ids, worker))}
+
+    def complete(self, job_id: int, worker: str, ok: bool, result: Union[dict[str, Any], None] = None,
+                 error: str = '', retry: bool = False) -> bool:
+        if ok:
+            status = "'done'"
+        elif retry:
+            status = f"CASE WHEN attempts < {MAX_ATTEMPTS} THEN 'queued' ELSE 'failed' END"
+        else:
+            status = "'failed'"
+        with self.transaction() as conn:
+            cursor = conn.execute(f"UPDATE jobs SET status = {status}, result = ?, error = ?, updated_at = ? "
+                                  f"WHERE id = ? AND status = 'leased' AND worker = ?",
+                                  (json.dumps(result or {}, ensure_ascii=False), error, time.time(), job_id, worker))
+            return cursor.rowcount == 1
+
+    def jobs(self, batch: str) -> list[QueueJob]:
+        with self.transaction() as conn:
+            self._expire(conn, time.time())
+            rows = conn.execute('SELECT id, batch, kind, key, payload, status, worker, lease_until, attempts, result, '
+                                'error FROM jobs WHERE batch = ? ORDER BY id', (batch,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def counts(self, batch: str) -> dict[str, int]:
+        counts = {'queued': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        with self.transaction() as conn:
+            self._expire(conn, time.time())
+            counts.update(conn.execute('SELECT status, COUNT(*) FROM jobs WHERE batch = ? GROUP BY status',
+                                       (batch,)).fetchall())
+        return counts
+
+    def requeue_failed(self, batch: str) -> int:
+        with self.transaction() as conn:
+            return conn.execute("UPDATE jobs SET status = 'queued', attempts = 0, error = '', updated_at = ? "
+                                "WHERE batch = ? AND status = 'failed'", (time.time(), batch)).rowcount
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+QUEUE_BACKENDS = {'memory': lambda _: MemoryQueue(), 'sqlite': SQLiteQueue}
+
+
+def open_queue(target: str = JOB_QUEUE_DB) -> JobQueue:
+    """`memory:` for the in-process stand-in, `sqlite:<path>` or a plain path for the shared SQLite file."""
+    scheme, sep, rest = target.partition(':')
+    if sep and scheme in QUEUE_BACKENDS:
+        return QUEUE_BACKENDS[scheme](rest)
+    return SQLiteQueue(target)
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def link_jobs(urls: Iterable[str]) -> Iterator[tuple[str, dict[str, Any]]]:
+    """`(pwd_id, payload)` jobs for share links, streamed; put() keeps one job per share."""
+    for url in urls:
+        pwd_id = parse_share_url(url)[0]
+        if pwd_id:
+            yield pwd_id, {'url': url.strip()}
+
+
+async def share_jobs(manager, share_url: str, depth: int, url_type: int = 1, expired_type: int = 2,
+                     password: str = '') -> list[tuple[str, dict[str, Any]]]:
+    """`(fid, payload)` jobs for every drive folder `depth` levels below the folder of `share_url`."""
+    pwd_id = share_url.rsplit('/', maxsplit=1)[1].split('-')[0]
+    options = {'url_type': url_type, 'expired_type': expired_type, 'password': password}
+    if depth == 0:
+        return [(pwd_id, {'path': ['direktori akar'], **options})]
+    return [(fid, {'path': list(path), **options}) async for path, fid in manager.iter_share_targets(pwd_id, depth)]
+
+
+async def run_job(manager, job: QueueJob, folder_id: str, force: bool = False,
+                  entry_filter: Union[EntryFilter, None] = None, incremental: bool = False) -> tuple[bool, dict, str, bool]:
+    """Runs one leased job and returns `(ok, result, error, retry)`; exceptions are worth a retry, a False result is not."""
+    p = job.payload
+    try:
+        if job.kind == 'share':
+            url = await manager.share_folder(job.key, p['path'][-1], url_type=p.get('url_type', 1),
+                                             expired_type=p.get('expired_type', 2), password=p.get('password', ''))
+            return True, {'url': url}, '', False
+        ok = await manager.run(p['url'], folder_id, download=job.kind == 'download', incremental=incremental,
+                               force=force, entry_filter=entry_filter)
+        return ok, {}, '' if ok else 'gagal', False
+    except Exception as e:
+        return False, {}, f'{type(e).__name__}: {e}', True
+
+
+async def work(manager, queue: JobQueue, batch: str, folder_id: str, worker: Union[str, None] = None,
+               concurrency: int = QUEUE_WORKERS, lease_timeout: float = LEASE_TIMEOUT,
+               heartbeat_interval: float = HEARTBEAT_INTERVAL, poll_interval: float = QUEUE_POLL_INTERVAL,
+               force: bool = False, entry_filter: Union[EntryFilter, None] = None,
+               incremental: bool = False) -> dict[str, int]:
+    """Leases and runs jobs of `batch` until none are queued or leased anywhere; returns this worker's counts.
+
+    Leases of running jobs are renewed every `heartbeat_interval`; a job whose lease was lost
+    (taken over by another worker after a stall) is cancelled here.
+    """
+    worker = worker or default_worker_id()
+    heartbeat_interval = min(heartbeat_interval, lease_timeout / 3)
+    running: dict[int, asyncio.Task] = {}
+    stats = {'done': 0, 'failed': 0, 'lost': 0}
+
+    async def execute(job: QueueJob) -> None:
+        ok, result, error, retry = await run_job(manager, job, folder_id, force=force, entry_filter=entry_filter,
+                                                 incremental=incremental)
+        result['worker'] = worker
+        if not await asyncio.to_thread(queue.complete, job.id, worker, ok, result, error, retry=retry):
+            stats['lost'] += 1
+        elif ok:
+            stats['done'] += 1
+        else:
+            stats['failed'] += 1
+            custom_print(f'Tugas {job.id} ({job.kind} {job.key}) gagal：{error}', error_msg=True)
+
+    async def heartbeat() -> None:
+        while True:
+            await asyncio.sleep(heartbeat_interval)
+            held = await asyncio.to_thread(queue.heartbeat, worker, list(running), lease_timeout)
+            for job_id, task in list(running.items()):
+                if job_id not in held:
+                    custom_print(f'Lease tugas {job_id} hilang, dihentikan di worker ini.', error_msg=True)
+                    task.cancel()
+
+    beat = asyncio.create_task(heartbeat())
+    custom_print(f'Worker {worker} mengambil tugas dari batch {batch}')
+    try:
+        while True:
+            free = concurrency - len(running)
+            jobs = await asyncio.to_thread(queue.lease, batch, worker, free, lease_timeout) if free > 0 else []
+            for job in jobs:
+                task = asyncio.create_task(execute(job))
+                running[job.id] = task
+                task.add_done_callback(lambda _, job_id=job.id: running.pop(job_id, None))
+            if not jobs and not running:
+                counts = await asyncio.to_thread(queue.counts, batch)
+                if not counts['queued'] and not counts['leased']:
+                    break
+            if not jobs:
+                # wait for a slot to free up, or for leases held elsewhere to finish or expire
+                if running:
+                    await asyncio.wait(list(running.values()), timeout=poll_interval,
+                                       return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    await asyncio.sleep(poll_interval)
+    finally:
+        beat.cancel()
+        for task in running.values():
+            task.cancel()
+        await asyncio.gather(beat, *running.values(), return_exceptions=True)
+    custom_print(f"Worker {worker} selesai：{stats['done']} berhasil，{stats['failed']} gagal，{stats['lost']} lease hilang")
+    return stats
+
+
+def merge_results(queue: JobQueue, batch: str, report_path: str = QUEUE_REPORT) -> dict[str, int]:
+    """Collects the outcome of every job of `batch` in one place.
+
+    Share jobs become a ResultStore run exported to the usual share_url.txt, share_error.txt and
+    retry.txt; link jobs are listed in `report_path` as `id | status | worker | url | error`.
+    """
+    jobs = queue.jobs(batch)
+    shares = [job for job in jobs if job.kind == 'share']
+    if shares:
+        store = ResultStore()
+        try:
+            run_id = store.new_run(f'queue:{batch}')
+            for n, job in enumerate(shares, 1):
+                status = 'ok' if job.status == 'done' else 'failed'
+                store.record(run_id, n, tuple(job.payload['path']), job.key, status, url=job.result.get('url', ''),
+                             error=job.error or ('' if status == 'ok' else job.status))
+            store.export(run_id, 'share/share_url.txt', 'share/share_error.txt', 'share/retry.txt')
+        finally:
+            store.close()
+    links = [job for job in jobs if job.kind != 'share']
+    if links:
+        os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+        with open(report_path + '.tmp', 'w', encoding='utf-8') as f:
+            for job in links:
+                worker = job.result.get('worker', job.worker)
+                f.write(' | '.join((str(job.id), job.status, worker, job.payload['url'], job.error)).rstrip(' |') + '\n')
+        os.replace(report_path + '.tmp', report_path)
+    return queue.counts(batch)
@@ -0,0 +1,64 @@
+import time
+from typing import Iterable, Union
+
+from quark_login import CONFIG_DIR
+from store import connect
+
+LEDGER_DB = f'{CONFIG_DIR}/ledger.db'
+
+
+class TransferLedger:
+    """Completed transfers: every saved share item by `(pwd_id, fid)`, and every share saved in full.
+
+    Item rows let an interrupted transfer continue without saving the same entries twice;
+    a share row lets a later run skip the link before any API call.
+    """
+
+    def __init__(self, path: str = LEDGER_DB) -> None:
+        self.path = path
+        self.conn = connect(path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS items (
+                pwd_id TEXT NOT NULL,
+                fid TEXT NOT NULL,
+                to_pdir_fid TEXT NOT NULL,
+                saved_at INTEGER NOT NULL,
+                PRIMARY KEY (pwd_id, fid)
+            );
+            CREATE TABLE IF NOT EXISTS shares (
+                pwd_id TEXT PRIMARY KEY,
+                to_pdir_fid TEXT NOT NULL,
+                items INTEGER NOT NULL,
+                saved_at INTEGER NOT NULL
+            );
+        ''')
+        self.conn.commit()
+
+    def share(self, pwd_id: str) -> Union[dict, None]:
+        """The completed transfer of `pwd_id`, if there is one."""
+        row = self.conn.execute('SELECT to_pdir_fid, items, saved_at FROM shares WHERE pwd_id = ?',
+                                (pwd_id,)).fetchone()
+        return dict(zip(('to_pdir_fid', 'items', 'saved_at'), row)) if row else None
+
+    def saved_items(self, pwd_id: str) -> set[str]:
+        return {fid for fid, in self.conn.execute('SELECT fid FROM items WHERE pwd_id = ?', (pwd_id,))}
+
+    def record_items(self, pwd_id: str, fids: Iterable[str], to_pdir_fid: str) -> None:
+        now = int(time.time())
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?)',
+                                  [(pwd_id, fid, to_pdir_fid, now) for fid in fids])
+
+    def record_share(self, pwd_id: str, to_pdir_fid: str, items: int) -> None:
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO shares VALUES (?, ?, ?, ?)',
+                              (pwd_id, to_pdir_fid, items, int(time.time())))
+
+    def forget(self, pwd_id: str) -> None:
+        """Drops everything recorded for `pwd_id`, so it is transferred again in full."""
+        with self.conn:
+            self.conn.execute('DELETE FROM items WHERE pwd_id = ?', (pwd_id,))
+            self.conn.execute('DELETE FROM shares WHERE pwd_id = ?', (pwd_id,))
+
+    def close(self) -> None:
+        self.conn.close()
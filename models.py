@@ -0,0 +1,91 @@
+import os
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Any, Union
+
+
+@dataclass(slots=True)
+class FileEntry:
+    fid: str
+    file_name: str
+    file_type: int
+    dir: bool
+    pdir_fid: str
+    include_items: Union[int, str]
+    share_fid_token: str
+    status: int
+    size: int = 0
+    updated_at: int = 0
+
+    @classmethod
+    def from_api(cls, file: dict[str, Any]) -> 'FileEntry':
+        # parent fids repeat for every sibling, so intern them (and folder fids, which become parents)
+        return cls(
+            fid=sys.intern(file["fid"]) if file["dir"] else file["fid"],
+            file_name=file["file_name"],
+            file_type=file["file_type"],
+            dir=bool(file["dir"]),
+            pdir_fid=sys.intern(file["pdir_fid"]),
+            include_items=file.get("include_items", ''),
+            share_fid_token=file.get("share_fid_token", ''),
+            status=file.get("status", 0),
+            size=file.get("size", 0) or 0,
+            updated_at=file.get("updated_at", 0) or 0,
+        )
+
+
+class FolderIndex:
+    """Folder tree of a share, stored as parallel arrays with memoized local paths.
+
+    A folder's parent must be added before the folder itself (listings always arrive in that
+    order); a parent that is not in the index is treated as the download root.
+    """
+
+    def __init__(self, root: str = 'downloads') -> None:
+        self.root = root
+        self._ids: dict[str, int] = {}
+        self._names: list[str] = []
+        self._parents = array('q')
+        self._paths: list[Union[str, None]] = []
+        self._created: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, fid: str) -> bool:
+        return fid in self._ids
+
+    def add(self, fid: str, file_name: str, pdir_fid: str) -> None:
+        if fid in self._ids:
+            return
+        self._ids[fid] = len(self._names)
+        self._names.append(file_name)
+        self._parents.append(self._ids.get(pdir_fid, -1))
+        self._paths.append(None)
+
+    def add_entry(self, entry: FileEntry) -> None:
+        if entry.dir:
+            self.add(entry.fid, entry.file_name, entry.pdir_fid)
+
+    def _relative_path(self, index: int) -> str:
+        path = self._paths[index]
+        if path is None:
+            parent = self._parents[index]
+            path = (self._relative_path(parent) if parent >= 0 else '') + '/' + self._names[index]
+            self._paths[index] = path
+        return path
+
+    def folder_path(self, pdir_fid: str) -> str:
+        """Local folder for the children of `pdir_fid`, e.g. `downloads//a/b`."""
+        index = self._ids.get(pdir_fid, -1)
+        return f"{self.root}/{self._relative_path(index) if index >= 0 else ''}"
+
+    def ensure_folder(self, pdir_fid: str) -> str:
+        """Same as folder_path(), creating the directory the first time it is asked for."""
+        path = self.folder_path(pdir_fid)
+        index = self._ids.get(pdir_fid, -1)
+        if index not in self._created:
+            os.makedirs(path, exist_ok=True)
+            self._created.add(index)
+        return path
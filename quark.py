@@ -1,25 +1,91 @@
-
-import asyncio
-import json
-import os
-import random
-import re
-import sys
-from typing import Any, Union
-
-import httpx
-from prettytable import PrettyTable
-from tqdm import tqdm
-
-from quark_login import CONFIG_DIR, QuarkLogin
-from utils import custom_print, generate_random_code, get_datetime, get_timestamp, read_config, safe_copy, save_config
+import time
+
+START = time.perf_counter()  # before the heavy imports below, for --timing
+
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import random  # noqa: E402
+import re  # noqa: E402
+import sys  # noqa: E402
+from collections import deque  # noqa: E402
+from typing import Any, AsyncIterator, Iterable, Union  # noqa: E402
+
+import httpx  # noqa: E402
+
+from cache import CACHE_PATH, LISTING_TTL, STOKEN_TTL, TTLCache  # noqa: E402
+from downloader import (DOWNLOAD_SEGMENTS, DOWNLOAD_WORKERS, MIN_SEGMENT_SIZE, DownloadJob, DownloadManifest,  # noqa: E402
+                        DownloadScheduler, download_to_file)
+from drive_index import ROOT_FID, DriveIndex  # noqa: E402
+from filters import EntryFilter, build_filter  # noqa: E402
+from ingest import LinkCheckpoint, count_urls, iter_urls  # noqa: E402
+from ledger import TransferLedger  # noqa: E402
+from models import FileEntry, FolderIndex  # noqa: E402
+from quark_login import BROWSER_DATA_DIR, CONFIG_DIR, QuarkLogin  # noqa: E402
+from ratelimit import RateLimiter, is_throttled  # noqa: E402
+from store import ResultStore  # noqa: E402
+from tasks import CAPACITY_LIMIT, TaskResult, TaskTracker  # noqa: E402
+from utils import (custom_print, format_size, generate_random_code, get_datetime, get_timestamp, parse_share_url,  # noqa: E402
+                   read_config, safe_copy, save_config)
+
+# Shared HTTP session settings, used by every API call and download of QuarkPanFileManager
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=60.0)
+HTTP_MAX_CONNECTIONS = 50
+HTTP_MAX_KEEPALIVE = 20
+HTTP_KEEPALIVE_EXPIRY = 30.0
+HTTP2 = False  # requires the optional `h2` package (pip install httpx[http2])
+
+TRANSFER_WORKERS = 5  # number of share links transferred at the same time in batch mode
+DETAIL_PAGE_SIZE = 50  # entries per sharepage/detail page
+LISTING_CONCURRENCY = 8  # listing requests in flight, shared by all folders and pages
+LISTING_WORKERS = 8  # folders walked at the same time by walk_share
+DOWNLOAD_URL_BATCH = 50  # fids per file/download request
+SAVE_CHUNK_SIZE = 100  # root items per share/sharepage/save task
+SAVE_CHUNKS_IN_FLIGHT = 4  # save tasks submitted and polled at the same time for one share
+SAVE_CHUNK_RETRIES = 3  # attempts per chunk before it is reported as failed
+SORT_PAGE_SIZE = 50  # entries per file/sort page when walking the drive
+SHARE_WORKERS = 4  # folders shared at the same time by share_run
+SHARE_RETRIES = 3  # attempts per folder before its share is reported as failed
+VALIDATE_WORKERS = 16  # share links checked at the same time by validate_links
+VALIDATE_REPORT = 'url_report.txt'
+TRANSFER_PLAN = 'transfer_plan.txt'
+QUOTA_RESERVE = 0  # bytes of free space a transfer plan leaves untouched
+LOGIN_REQUIRED = 31001  # API code of a request whose cookie is no longer logged in
+
+
+class QuarkTaskError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(f'{code}: {message}')
+        self.code = code
+        self.message = message
 
 
 class QuarkPanFileManager:
-    def __init__(self, headless: bool = False, slow_mo: int = 0) -> None:
+    def __init__(self, headless: bool = False, slow_mo: int = 0, http2: bool = HTTP2,
+                 max_connections: int = HTTP_MAX_CONNECTIONS, max_keepalive: int = HTTP_MAX_KEEPALIVE,
+                 download_segments: int = DOWNLOAD_SEGMENTS, min_segment_size: int = MIN_SEGMENT_SIZE,
+                 cache_path: Union[str, None] = CACHE_PATH, config_dir: str = CONFIG_DIR) -> None:
         self.headless: bool = headless
         self.slow_mo: int = slow_mo
-        self.folder_id: Union[str, None] = None
+        self.download_segments: int = download_segments
+        self.min_segment_size: int = min_segment_size
+        self.http2: bool = http2
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=HTTP_KEEPALIVE_EXPIRY)
+        self.client: Union[httpx.AsyncClient, None] = None
+        self.listing_semaphore: Union[asyncio.Semaphore, None] = None
+        self.rate_limiter = RateLimiter()
+        self.task_tracker: Union[TaskTracker, None] = None
+        self.results: Union[ResultStore, None] = None
+        self.drive_index: Union[DriveIndex, None] = None
+        self.first_response_at: Union[float, None] = None  # time.perf_counter() of the first API response
+        self.ledger: Union[TransferLedger, None] = None
+        self.cache = TTLCache(ttl=LISTING_TTL, path=cache_path)
+        # cookies, save folder, drive index and ledger belong to one account and live in its config_dir
+        self.config_dir: str = config_dir
+        self.config_path: str = f'{config_dir}/config.json'
+        self.cookie_path: str = f'{config_dir}/cookies.txt'
+        self.session_expired: bool = False
         self.user: Union[str, None] = '用户A'
         self.pdir_id: Union[str, None] = '0'
         self.dir_name: Union[str, None] = '根目录'
@@ -34,13 +100,68 @@ class QuarkPanFileManager:
         }
 
     def get_cookies(self) -> str:
-        quark_login = QuarkLogin(headless=self.headless, slow_mo=self.slow_mo)
+        profile_dir = BROWSER_DATA_DIR if self.config_dir == CONFIG_DIR else f'{self.config_dir}/web_browser_data'
+        quark_login = QuarkLogin(headless=self.headless, slow_mo=self.slow_mo, cookie_path=self.cookie_path,
+                                 profile_dir=profile_dir)
         cookies: str = quark_login.get_cookies()
         return cookies
 
+    def get_client(self) -> httpx.AsyncClient:
+        if self.client is None or self.client.is_closed:
+            http2 = self.http2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    custom_print('Paket h2 tidak terpasang, kembali ke HTTP/1.1.', error_msg=True)
+                    http2 = self.http2 = False
+            self.client = httpx.AsyncClient(http2=http2, limits=self.limits, timeout=HTTP_TIMEOUT)
+        return self.client
+
+    async def request_json(self, endpoint: str, method: str, url: str, **kwargs) -> dict[str, Any]:
+        """Sends an API request through the endpoint's adaptive rate limit and feeds the outcome back to it."""
+        bucket = self.rate_limiter.get(endpoint)
+        await bucket.acquire()
+        try:
+            response = await self.get_client().request(method, url, **kwargs)
+            json_data = response.json()
+            if self.first_response_at is None:
+                self.first_response_at = time.perf_counter()
+        except (httpx.TransportError, ValueError) as e:
+            bucket.throttled(f'({type(e).__name__})')
+            raise
+        if response.status_code == 401 or isinstance(json_data, dict) and json_data.get('code') == LOGIN_REQUIRED:
+            self.session_expired = True
+        if is_throttled(response.status_code, json_data):
+            bucket.throttled(f'(HTTP {response.status_code})')
+        else:
+            bucket.success()
+        return json_data
+
+    async def close(self) -> None:
+        if self.client is not None and not self.client.is_closed:
+            await self.client.aclose()
+        self.client = None
+        if self.results is not None:
+            self.results.close()
+            self.results = None
+        if self.drive_index is not None:
+            self.drive_index.close()
+            self.drive_index = None
+        if self.ledger is not None:
+            self.ledger.close()
+            self.ledger = None
+        self.cache.save()
+
+    async def __aenter__(self) -> 'QuarkPanFileManager':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
     @staticmethod
     def get_pwd_id(share_url: str) -> str:
-        return share_url.split('?')[0].split('/s/')[-1]
+        return parse_share_url(share_url)[0]
 
     @staticmethod
     def extract_urls(text: str) -> list:
@@ -48,6 +169,16 @@ class QuarkPanFileManager:
         return re.findall(url_pattern, text)[0]
 
     async def get_stoken(self, pwd_id: str, password: str = '') -> str:
+        stoken, message = await self.fetch_stoken(pwd_id, password)
+        if not stoken:
+            custom_print(f"Transfer berkas gagal，{message}")
+        return stoken
+
+    async def fetch_stoken(self, pwd_id: str, password: str = '') -> tuple[str, str]:
+        """Returns `(stoken, '')`, or `('', message)` when the share cannot be opened."""
+        stoken = self.cache.get(('stoken', pwd_id))
+        if stoken:
+            return stoken, ''
         params = {
             'pr': 'ucpro',
             'fr': 'pc',
@@ -57,72 +188,165 @@ class QuarkPanFileManager:
         }
         api = "https://drive-pc.quark.cn/1/clouddrive/share/sharepage/token"
         data = {"pwd_id": pwd_id, "passcode": password}
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.post(api, json=data, params=params, headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            if json_data['status'] == 200 and json_data['data']:
-                stoken = json_data["data"]["stoken"]
-            else:
-                stoken = ''
-                custom_print(f"Transfer berkas gagal，{json_data['message']}")
-            return stoken
+        json_data = await self.request_json('token', 'POST', api, json=data, params=params, headers=self.headers)
+        if json_data['status'] == 200 and json_data['data']:
+            stoken = json_data["data"]["stoken"]
+            self.cache.set(('stoken', pwd_id), stoken, ttl=STOKEN_TTL)
+            return stoken, ''
+        return '', json_data.get('message', '')
+
+    def get_listing_semaphore(self) -> asyncio.Semaphore:
+        if self.listing_semaphore is None:
+            self.listing_semaphore = asyncio.Semaphore(LISTING_CONCURRENCY)
+        return self.listing_semaphore
+
+    async def get_detail_page(self, pwd_id: str, stoken: str, pdir_fid: str = '0', page: int = 1) -> dict[str, Any]:
+        key = ('detail', pwd_id, pdir_fid, page, DETAIL_PAGE_SIZE)
+        json_data = self.cache.get(key)
+        if json_data is not None:
+            return json_data
+        api = "https://drive-pc.quark.cn/1/clouddrive/share/sharepage/detail"
+        params = {
+            'pr': 'ucpro',
+            'fr': 'pc',
+            'uc_param_str': '',
+            "pwd_id": pwd_id,
+            "stoken": stoken,
+            'pdir_fid': pdir_fid,
+            'force': '0',
+            "_page": str(page),
+            '_size': str(DETAIL_PAGE_SIZE),
+            '_sort': 'file_type:asc,updated_at:desc',
+            '__dt': random.randint(200, 9999),
+            '__t': get_timestamp(13),
+        }
+
+        async with self.get_listing_semaphore():
+            json_data = await self.request_json('detail', 'GET', api, headers=self.headers, params=params)
+        if json_data.get('status') == 200 and json_data.get('data'):
+            self.cache.set(key, json_data)
+        return json_data
+
+    @staticmethod
+    def parse_detail_list(json_data: dict[str, Any]) -> list[FileEntry]:
+        return [FileEntry.from_api(file) for file in json_data["data"]["list"]]
+
+    async def iter_detail(self, pwd_id: str, stoken: str,
+                          pdir_fid: str = '0') -> AsyncIterator[tuple[int, list[FileEntry]]]:
+        """Yields `(is_owner, entries)` page by page, prefetching a bounded number of later pages."""
+        json_data = await self.get_detail_page(pwd_id, stoken, pdir_fid, page=1)
+        is_owner = json_data['data']['is_owner']
+        _total = json_data['metadata']['_total']
+        if _total < 1:
+            return
+        _size = json_data['metadata']['_size']  # Jumlah halaman per halaman
+        first_page = self.parse_detail_list(json_data)
+        yield is_owner, first_page
+
+        # page 1 tells the total, so later pages are requested ahead while earlier ones are consumed
+        pages = -(-_total // _size) if _size else 1
+        if pages < 2 or len(first_page) < _size:
+            return
+        pending: deque[asyncio.Task] = deque()
+        next_page = 2
+        try:
+            while next_page <= pages or pending:
+                while next_page <= pages and len(pending) < LISTING_CONCURRENCY:
+                    pending.append(asyncio.create_task(self.get_detail_page(pwd_id, stoken, pdir_fid, next_page)))
+                    next_page += 1
+                page_data = await pending.popleft()
+                yield is_owner, self.parse_detail_list(page_data)
+        finally:
+            for task in pending:
+                task.cancel()
 
     async def get_detail(self, pwd_id: str, stoken: str, pdir_fid: str = '0') -> str | tuple | None:
-        api = "https://drive-pc.quark.cn/1/clouddrive/share/sharepage/detail"
-        page = 1
-        file_list: list[dict[str, Union[int, str]]] = []
+        is_owner = 0
+        file_list: list[FileEntry] = []
+        async for is_owner, page in self.iter_detail(pwd_id, stoken, pdir_fid):
+            file_list.extend(page)
+        return is_owner, file_list
+
+    async def iter_share_tree(self, pwd_id: str, stoken: str, folders: list[FileEntry],
+                              workers: int = LISTING_WORKERS,
+                              failed: Union[list[FileEntry], None] = None,
+                              entry_filter: Union[EntryFilter, None] = None) -> AsyncIterator[list[FileEntry]]:
+        """Yields pages of every entry below `folders`, walked breadth-first with up to `workers` folders in flight.
+
+        A folder's own entry is always yielded before any page of its contents. Folders that
+        could not be listed are appended to `failed`. With `entry_filter`, pages only hold the
+        entries it accepts and excluded folders are never listed.
+        """
+        failed = failed if failed is not None else []
+        folder_queue: asyncio.Queue = asyncio.Queue()
+        page_queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        for folder in folders:
+            folder_queue.put_nowait(folder)
+
+        async def list_folder(folder: FileEntry) -> None:
+            emitted = 0
+            for attempt in range(3):
+                try:
+                    page_index = 0
+                    async for _, page in self.iter_detail(pwd_id, stoken, pdir_fid=folder.fid):
+                        page_index += 1
+                        if page_index <= emitted:
+                            # already handed out before a retry
+                            continue
+                        if entry_filter:
+                            page = entry_filter.apply(page)
+                        await page_queue.put(page)
+                        emitted = page_index
+                        for child in page:
+                            if child.dir:
+                                folder_queue.put_nowait(child)
+                    return
+                except Exception as e:
+                    # any error (a page with `data: null` raises TypeError) must not end the worker,
+                    # or folder_queue.join() never returns
+                    if attempt == 2:
+                        custom_print(f'Gagal membaca folder {folder.file_name}：{type(e).__name__}: {e}', error_msg=True)
+                        failed.append(folder)
+                    else:
+                        await asyncio.sleep(2 ** attempt)
 
-        async with httpx.AsyncClient() as client:
+        async def worker() -> None:
             while True:
-                params = {
-                    'pr': 'ucpro',
-                    'fr': 'pc',
-                    'uc_param_str': '',
-                    "pwd_id": pwd_id,
-                    "stoken": stoken,
-                    'pdir_fid': pdir_fid,
-                    'force': '0',
-                    "_page": str(page),
-                    '_size': '50',
-                    '_sort': 'file_type:asc,updated_at:desc',
-                    '__dt': random.randint(200, 9999),
-                    '__t': get_timestamp(13),
-                }
-
-                timeout = httpx.Timeout(60.0, connect=60.0)
-                response = await client.get(api, headers=self.headers, params=params, timeout=timeout)
-                json_data = response.json()
-
-                is_owner = json_data['data']['is_owner']
-                _total = json_data['metadata']['_total']
-                if _total < 1:
-                    return is_owner, file_list
-
-                _size = json_data['metadata']['_size']  # Jumlah halaman per halaman
-                _count = json_data['metadata']['_count']  # Jumlah halaman saat ini
-
-                _list = json_data["data"]["list"]
-
-                for file in _list:
-                    d: dict[str, Union[int, str]] = {
-                        "fid": file["fid"],
-                        "file_name": file["file_name"],
-                        "file_type": file["file_type"],
-                        "dir": file["dir"],
-                        "pdir_fid": file["pdir_fid"],
-                        "include_items": file.get("include_items", ''),
-                        "share_fid_token": file["share_fid_token"],
-                        "status": file["status"]
-                    }
-                    file_list.append(d)
-                if _total <= _size or _count < _size:
-                    return is_owner, file_list
-
-                page += 1
+                folder = await folder_queue.get()
+                try:
+                    await list_folder(folder)
+                finally:
+                    folder_queue.task_done()
+
+        async def close_when_done() -> None:
+            await folder_queue.join()
+            await page_queue.put(None)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+        tasks.append(asyncio.create_task(close_when_done()))
+        try:
+            while (page := await page_queue.get()) is not None:
+                yield page
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def walk_share(self, pwd_id: str, stoken: str, folders: list[FileEntry], workers: int = LISTING_WORKERS,
+                         entry_filter: Union[EntryFilter, None] = None) -> tuple[list[FileEntry], list[FileEntry]]:
+        entries: list[FileEntry] = []
+        failed: list[FileEntry] = []
+        async for page in self.iter_share_tree(pwd_id, stoken, folders, workers=workers, failed=failed,
+                                               entry_filter=entry_filter):
+            entries.extend(page)
+        return entries, failed
 
     async def get_sorted_file_list(self, pdir_fid='0', page='1', size='100', fetch_total='false',
                                    sort='') -> dict[str, Any]:
+        key = ('drive', pdir_fid, page, size, fetch_total, sort)
+        json_data = self.cache.get(key)
+        if json_data is not None:
+            return json_data
         params = {
             'pr': 'ucpro',
             'fr': 'pc',
@@ -137,34 +361,51 @@ class QuarkPanFileManager:
             '__t': get_timestamp(13),
         }
 
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.get('https://drive-pc.quark.cn/1/clouddrive/file/sort', params=params,
-                                        headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            return json_data
-
-    async def get_user_info(self) -> str:
+        json_data = await self.request_json('sort', 'GET', 'https://drive-pc.quark.cn/1/clouddrive/file/sort',
+                                            params=params, headers=self.headers)
+        if json_data.get('code') == 0 and json_data.get('data'):
+            self.cache.set(key, json_data)
+        return json_data
 
+    async def fetch_user_info(self) -> Union[str, None]:
+        """The account nickname, or None when the cookie is not logged in (any more)."""
         params = {
             'fr': 'pc',
             'platform': 'pc',
         }
 
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.get('https://pan.quark.cn/account/info', params=params,
-                                        headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            if json_data['data']:
-                nickname = json_data['data']['nickname']
-                return nickname
-            else:
-                input("Login gagal! Silakan jalankan program ini lagi dan kemudian masuk ke akun Quark Anda di browser pop-up.")
-                with open(f'{CONFIG_DIR}/cookies.txt', 'w', encoding='utf-8'):
-                    sys.exit(-1)
+        json_data = await self.request_json('account', 'GET', 'https://pan.quark.cn/account/info', params=params,
+                                            headers=self.headers)
+        if json_data.get('data'):
+            return json_data['data']['nickname']
+        self.session_expired = True
+        return None
 
-    async def create_dir(self, pdir_name='Folder Baru') -> None:
+    async def get_user_info(self) -> str:
+        nickname = await self.fetch_user_info()
+        if nickname:
+            return nickname
+        else:
+            input("Login gagal! Silakan jalankan program ini lagi dan kemudian masuk ke akun Quark Anda di browser pop-up.")
+            with open(self.cookie_path, 'w', encoding='utf-8'):
+                sys.exit(-1)
+
+    async def get_capacity(self) -> tuple[int, int]:
+        """Returns `(total, used)` bytes of the account's cloud drive."""
+        params = {
+            'pr': 'ucpro',
+            'fr': 'pc',
+            'uc_param_str': '',
+            'fetch_subscribe': 'true',
+            '_ch': 'home',
+            'fetch_identity': 'true',
+        }
+        json_data = await self.request_json('member', 'GET', 'https://drive-pc.quark.cn/1/clouddrive/member',
+                                            params=params, headers=self.headers)
+        data = json_data['data']
+        return int(data['total_capacity']), int(data['use_capacity'])
+
+    async def request_create_dir(self, pdir_fid: str, pdir_name: str) -> dict[str, Any]:
         params = {
             'pr': 'ucpro',
             'fr': 'pc',
@@ -174,132 +415,520 @@ class QuarkPanFileManager:
         }
 
         json_data = {
-            'pdir_fid': '0',
+            'pdir_fid': pdir_fid,
             'file_name': pdir_name,
             'dir_path': '',
             'dir_init_lock': False,
         }
 
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.post('https://drive-pc.quark.cn/1/clouddrive/file', params=params,
-                                         json=json_data, headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            if json_data["code"] == 0:
-                custom_print(f'Direktori akar {pdir_name} Folder berhasil dibuat.！')
-                new_config = {'user': self.user, 'pdir_id': json_data["data"]["fid"], 'dir_name': pdir_name}
-                save_config(f'{CONFIG_DIR}/config.json', content=json.dumps(new_config, ensure_ascii=False))
-                global to_dir_id
-                to_dir_id = json_data["data"]["fid"]
-                custom_print(f"Secara otomatis mengganti direktori penyimpanan ke {pdir_name} Map")
-            elif json_data["code"] == 23008:
-                custom_print('Terjadi konflik nama folder, silakan coba lagi setelah mengubah nama folder.', error_msg=True)
-            else:
-                custom_print(f"pesan kesalahan：{json_data['message']}", error_msg=True)
+        json_data = await self.request_json('file', 'POST', 'https://drive-pc.quark.cn/1/clouddrive/file',
+                                            params=params, json=json_data, headers=self.headers)
+        if json_data["code"] == 0:
+            self.cache.invalidate('drive', pdir_fid)
+        return json_data
+
+    async def ensure_drive_folder(self, pdir_fid: str, name: str) -> str:
+        """fid of the folder `name` in `pdir_fid`, created if it does not exist yet."""
+        json_data = await self.request_create_dir(pdir_fid, name)
+        if json_data["code"] == 0:
+            return json_data["data"]["fid"]
+        if json_data["code"] == 23008:
+            self.cache.invalidate('drive', pdir_fid)
+            for folder in await self.list_drive_folders(pdir_fid):
+                if folder['file_name'] == name:
+                    return folder['fid']
+        raise QuarkTaskError(json_data["code"], json_data.get('message', ''))
+
+    async def create_dir(self, pdir_name='Folder Baru') -> bool:
+        json_data = await self.request_create_dir('0', pdir_name)
+        if json_data["code"] == 0:
+            custom_print(f'Direktori akar {pdir_name} Folder berhasil dibuat.！')
+            self.get_drive_index().add_folder(json_data["data"]["fid"], pdir_name)
+            self.save_folder_config(json_data["data"]["fid"], pdir_name)
+            global to_dir_id
+            to_dir_id = json_data["data"]["fid"]
+            custom_print(f"Secara otomatis mengganti direktori penyimpanan ke {pdir_name} Map")
+            return True
+        elif json_data["code"] == 23008:
+            custom_print('Terjadi konflik nama folder, silakan coba lagi setelah mengubah nama folder.', error_msg=True)
+        else:
+            custom_print(f"pesan kesalahan：{json_data['message']}", error_msg=True)
+        return False
+
+    def get_ledger(self) -> TransferLedger:
+        if self.ledger is None:
+            self.ledger = TransferLedger(f'{self.config_dir}/ledger.db')
+        return self.ledger
 
-    async def run(self, input_line: str, folder_id: Union[str, None] = None, download: bool = False) -> None:
-        self.folder_id = folder_id
+    async def run(self, input_line: str, folder_id: Union[str, None] = None, download: bool = False,
+                  incremental: bool = False, force: bool = False,
+                  entry_filter: Union[EntryFilter, None] = None) -> bool:
         share_url = input_line.strip()
         custom_print(f'Tautan berbagi file：{share_url}')
-        match_password = re.search("pwd=(.*?)(?=$|&)", share_url)
-        password = match_password.group(1) if match_password else ""
-        pwd_id = self.get_pwd_id(input_line).split("#")[0]
+        pwd_id, password = parse_share_url(share_url)
         if not pwd_id:
             custom_print('Tautan berbagi file tidak boleh kosong.！', error_msg=True)
-            return
+            return False
+        if not download:
+            if force:
+                self.get_ledger().forget(pwd_id)
+            elif (record := self.get_ledger().share(pwd_id)) is not None:
+                custom_print(f"Tautan ini sudah ditransfer pada {get_datetime(record['saved_at'])} "
+                             f"({record['items']} item), dilewati. Gunakan transfer paksa untuk mengulanginya.")
+                return True
         stoken = await self.get_stoken(pwd_id, password)
         if not stoken:
-            return
-        is_owner, data_list = await self.get_detail(pwd_id, stoken)
-        files_count = 0
-        folders_count = 0
-        files_list: list[str] = []
-        folders_list: list[str] = []
-        folders_map = {}
-        files_id_list = []
-        file_fid_list = []
-
-        if data_list:
-            total_files_count = len(data_list)
-            for data in data_list:
-                if data['dir']:
-                    folders_count += 1
-                    folders_list.append(data["file_name"])
-                    folders_map[data["fid"]] = {
-                        "file_name": data["file_name"],
-                        "pdir_fid": data["pdir_fid"]
-                    }
-                else:
-                    files_count += 1
-                    files_list.append(data["file_name"])
-                    files_id_list.append((data["fid"], data["file_name"]))
+            return False
 
-            custom_print(f'Jumlah total transfer：{total_files_count}，Jumlah file：{files_count}，Jumlah folder：{folders_count} | Mendukung penestingan')
-            custom_print(f'Daftar Transfer File：{files_list}')
-            custom_print(f'Daftar Transfer Folder：{folders_list}')
-
-            fid_list = [i["fid"] for i in data_list]
-            share_fid_token_list = [i["share_fid_token"] for i in data_list]
+        pages = self.iter_detail(pwd_id, stoken)
+        try:
+            is_owner, first_page = await anext(pages, (0, []))
+            if not first_page:
+                return False
 
-            if not self.folder_id:
+            if not folder_id:
                 custom_print('ID direktori yang tersimpan tidak valid. Silakan ambil kembali. Jika Anda tidak dapat mengambilnya, silakan masukkan 0 sebagai ID folder.')
-                return
+                return False
+
+            async def root_pages() -> AsyncIterator[list[FileEntry]]:
+                yield first_page
+                async for _, page in pages:
+                    yield page
 
             if download:
                 if is_owner == 0:
                     custom_print(
                         'File yang akan diunduh harus berada di penyimpanan cloud Anda sendiri. Silakan transfer file tersebut ke penyimpanan cloud Anda terlebih dahulu, lalu dapatkan tautan berbagi dari penyimpanan cloud Anda untuk mengunduhnya.')
-                    return
-
-                for i in data_list:
-                    if i['dir']:
-                        data_list2 = [i]
-                        not_dir = False
-                        while True:
-                            data_list3 = []
-                            for i2 in data_list2:
-                                custom_print(f'Mulai mengunduh：{i2["file_name"]} Di dalam folder{i2["include_items"]}berkas')
-                                is_owner, file_data_list = await self.get_detail(pwd_id, stoken, pdir_fid=i2['fid'])
-
-                                # record folder's fid start
-                                if file_data_list:
-                                    for data in file_data_list:
-                                        if data['dir']:
-                                            folders_map[data["fid"]] = {
-                                                "file_name": data["file_name"],
-                                                "pdir_fid": data["pdir_fid"]
-                                            }
-
-                                # record folder's fid stop
-                                folder = i["file_name"]
-                                fid_list = [i["fid"] for i in file_data_list]
-                                await self.quark_file_download(fid_list, folder=folder, folders_map=folders_map)
-                                file_fid_list.extend([i for i in file_data_list if not i2['dir']])
-                                dir_list = [i for i in file_data_list if i['dir']]
-
-                                if not dir_list:
-                                    not_dir = True
-                                data_list3.extend(dir_list)
-                            data_list2 = data_list3
-                            if not data_list2 or not_dir:
-                                break
-
-                if len(files_id_list) > 0 or len(file_fid_list) > 0:
-                    fid_list = [i[0] for i in files_id_list]
-                    file_fid_list.extend(fid_list)
-                    await self.quark_file_download(file_fid_list, folder='.', folders_map=folders_map)
-
+                    return False
+                ok = await self.download_share(pwd_id, stoken, root_pages(), incremental=incremental,
+                                               entry_filter=entry_filter)
             else:
                 if is_owner == 1:
                     custom_print('File tersebut sudah ada di penyimpanan cloud; tidak perlu mentransfernya lagi.')
+                    return True
+                ok = await self.transfer_share(pwd_id, stoken, root_pages(), folder_id, entry_filter=entry_filter)
+        finally:
+            await pages.aclose()
+        print()
+        return ok
+
+    async def transfer_share(self, pwd_id: str, stoken: str, pages: AsyncIterator[list[FileEntry]], folder_id: str,
+                             chunk_size: int = SAVE_CHUNK_SIZE, entry_filter: Union[EntryFilter, None] = None) -> bool:
+        """Saves a share into the drive folder `folder_id` in chunks of `chunk_size` items.
+
+        A chunk is submitted as soon as enough root entries are listed, while earlier chunks are
+        still being polled; a failed chunk is retried on its own.
+
+        With an active `entry_filter` folders cannot be saved whole: the tree is walked without
+        the excluded folders, and the matching files are saved into copies of their folders
+        below the target folder. Such a partial transfer is not marked as complete in the ledger.
+        """
+        ledger = self.get_ledger()
+        saved = ledger.saved_items(pwd_id)
+        files_count = 0
+        folders_count = 0
+        skipped = 0
+        chunks: list[asyncio.Task] = []
+        in_flight = asyncio.Semaphore(SAVE_CHUNKS_IN_FLIGHT)
+        progress = {'chunks': 0, 'items': 0}
+        stop: list[TaskResult] = []
+        share_folders: dict[str, FileEntry] = {}
+        targets: dict[str, asyncio.Task] = {}
+
+        async def target_folder(pdir_fid: str) -> str:
+            # a copy of the share folder `pdir_fid` below the target folder, created on first use
+            if pdir_fid not in share_folders:
+                return folder_id
+            if pdir_fid not in targets:
+                async def create() -> str:
+                    folder = share_folders[pdir_fid]
+                    try:
+                        return await self.ensure_drive_folder(await target_folder(folder.pdir_fid), folder.file_name)
+                    except BaseException:
+                        # let a retry create it again
+                        targets.pop(pdir_fid, None)
+                        raise
+                targets[pdir_fid] = asyncio.create_task(create())
+            return await targets[pdir_fid]
+
+        async def save_chunk(index: int, chunk: list[FileEntry]) -> TaskResult:
+            async with in_flight:
+                result = TaskResult('', False, 0, 'dibatalkan')
+                pdir_fid = chunk[0].pdir_fid if chunk[0].pdir_fid in share_folders else '0'
+                for attempt in range(SAVE_CHUNK_RETRIES):
+                    if stop:
+                        # the drive is full or the target folder is gone, later chunks cannot succeed
+                        return stop[0]
+                    try:
+                        to_pdir_fid = await target_folder(pdir_fid)
+                        task_id = await self.get_share_save_task_id(pwd_id, stoken, [i.fid for i in chunk],
+                                                                    [i.share_fid_token for i in chunk],
+                                                                    to_pdir_fid=to_pdir_fid, pdir_fid=pdir_fid)
+                        result = await self.submit_task(task_id)
+                    except QuarkTaskError as e:
+                        result = TaskResult('', False, e.code, e.message)
+                    except (httpx.HTTPError, KeyError, TypeError, ValueError) as e:
+                        result = TaskResult('', False, 0, f'{type(e).__name__}: {e}')
+                    if result.ok:
+                        break
+                    if result.capacity_exceeded or result.folder_missing:
+                        stop.append(result)
+                        break
+                    if attempt < SAVE_CHUNK_RETRIES - 1:
+                        custom_print(f'Bagian {index} gagal ({result.message}), mencoba lagi...', error_msg=True)
+                        await asyncio.sleep(2 ** attempt)
+            if result.ok:
+                ledger.record_items(pwd_id, [i.fid for i in chunk], folder_id)
+                progress['chunks'] += 1
+                progress['items'] += len(chunk)
+                custom_print(f"Bagian {index} selesai：{progress['chunks']}/{len(chunks)} bagian，"
+                             f"{progress['items']}/{files_count + folders_count} item tersimpan")
+            return result
+
+        # chunks being filled, per source folder (there is only the root without a filter)
+        pending: dict[str, list[FileEntry]] = {}
+
+        def add(entry: FileEntry) -> None:
+            nonlocal skipped
+            if entry.fid in saved:
+                # saved by an earlier, interrupted run of the same link
+                skipped += 1
+                return
+            chunk = pending.setdefault(entry.pdir_fid, [])
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                chunks.append(asyncio.create_task(save_chunk(len(chunks) + 1, pending.pop(entry.pdir_fid))))
+
+        folders: list[FileEntry] = []
+        failed_folders: list[FileEntry] = []
+        try:
+            async for page in pages:
+                if entry_filter:
+                    page = entry_filter.apply(page)
+                    folders.extend(i for i in page if i.dir)
+                    page = [i for i in page if not i.dir]
+                files_list = [i.file_name for i in page if not i.dir]
+                folders_list = [i.file_name for i in page if i.dir]
+                files_count += len(files_list)
+                folders_count += len(folders_list)
+                custom_print(f'Daftar Transfer File：{files_list}')
+                custom_print(f'Daftar Transfer Folder：{folders_list}')
+                for entry in page:
+                    add(entry)
+
+            if folders:
+                custom_print(f'Mencari berkas yang cocok di {len(folders)} folder')
+                share_folders.update((i.fid, i) for i in folders)
+                async for page in self.iter_share_tree(pwd_id, stoken, folders, failed=failed_folders,
+                                                       entry_filter=entry_filter):
+                    for entry in page:
+                        if entry.dir:
+                            share_folders[entry.fid] = entry
+                        else:
+                            files_count += 1
+                            add(entry)
+        except asyncio.CancelledError:
+            for task in chunks:
+                task.cancel()
+            await asyncio.gather(*chunks, return_exceptions=True)
+            raise
+        except Exception as e:
+            # the listing failed: chunks already submitted finish and reach the ledger, waiting ones do not start
+            stop.append(TaskResult('', False, 0, f'{type(e).__name__}: {e}'))
+            await asyncio.gather(*chunks, return_exceptions=True)
+            raise
+        for chunk in pending.values():
+            chunks.append(asyncio.create_task(save_chunk(len(chunks) + 1, chunk)))
+
+        custom_print(f'Jumlah total transfer：{files_count + folders_count}，Jumlah file：{files_count}，Jumlah folder：{folders_count} | Mendukung penestingan')
+        if skipped:
+            custom_print(f'{skipped} item sudah tersimpan sebelumnya dan dilewati')
+        results: list[TaskResult] = await asyncio.gather(*chunks)
+        failed = [result for result in results if not result.ok]
+        if failed:
+            custom_print(f"{len(failed)}/{len(results)} bagian gagal，{progress['items']} item tersimpan", error_msg=True)
+            raise QuarkTaskError(failed[0].code, failed[0].message)
+        if failed_folders:
+            custom_print(f'{len(failed_folders)} folder tidak dapat dibaca; isinya tidak ditransfer.', error_msg=True)
+            return False
+        if not entry_filter:
+            ledger.record_share(pwd_id, folder_id, files_count + folders_count)
+        return True
+
+    async def download_share(self, pwd_id: str, stoken: str, pages: AsyncIterator[list[FileEntry]],
+                             incremental: bool = False, entry_filter: Union[EntryFilter, None] = None) -> bool:
+        """Downloads a share while it is still being listed.
+
+        Root pages and then the pages of the tree walk feed file batches straight into the
+        download scheduler, so only the folder map and the current batch are kept in memory.
+        """
+        manifest = DownloadManifest() if incremental else None
+        scheduler = self.new_download_scheduler(manifest=manifest)
+        folders_map = FolderIndex()
+        folders: list[FileEntry] = []
+        failed_folders: list[FileEntry] = []
+        batch: dict[str, FileEntry] = {}
+        files_count = 0
+
+        async def flush() -> None:
+            if batch:
+                await self.quark_file_download(list(batch), folder='.', folders_map=folders_map,
+                                               scheduler=scheduler, entries=dict(batch), manifest=manifest)
+                batch.clear()
+
+        async def consume(page: list[FileEntry]) -> None:
+            nonlocal files_count
+            for data in page:
+                if data.dir:
+                    folders_map.add_entry(data)
+                else:
+                    batch[data.fid] = data
+                    files_count += 1
+            if len(batch) >= DOWNLOAD_URL_BATCH:
+                await flush()
+
+        async for page in pages:
+            if entry_filter:
+                page = entry_filter.apply(page)
+            await consume(page)
+            folders.extend(i for i in page if i.dir)
+        await flush()
+
+        if folders:
+            custom_print(f'Mulai menelusuri {len(folders)} folder')
+            async for page in self.iter_share_tree(pwd_id, stoken, folders, failed=failed_folders,
+                                                   entry_filter=entry_filter):
+                await consume(page)
+            await flush()
+            if failed_folders:
+                custom_print(f'{len(failed_folders)} folder tidak dapat dibaca; isinya tidak diunduh.', error_msg=True)
+        custom_print(f'Penelusuran selesai：{len(folders_map)} folder，{files_count} berkas')
+
+        done, failed = await scheduler.join()
+        custom_print(f'Unduhan selesai：{len(done)} berhasil，{len(failed)} gagal')
+        if manifest is not None:
+            manifest.save()
+        return not failed and not failed_folders
+
+    async def measure_share(self, url: str, force: bool = False,
+                            entry_filter: Union[EntryFilter, None] = None) -> dict[str, Any]:
+        """Lists a whole share and adds up the sizes of the items a transfer would still save.
+
+        With an active `entry_filter` only the files it accepts count, as transfer_share saves them.
+        """
+        pwd_id, password = parse_share_url(url)
+        plan = {'url': url, 'pwd_id': pwd_id, 'size': 0, 'files': 0, 'status': 'error', 'message': ''}
+        if not force and self.get_ledger().share(pwd_id) is not None:
+            plan.update(status='skip', message='sudah ditransfer')
+            return plan
+        stoken, message = await self.fetch_stoken(pwd_id, password)
+        if not stoken:
+            plan['message'] = message
+            return plan
+
+        saved = set() if force else self.get_ledger().saved_items(pwd_id)
+        root: list[FileEntry] = []
+        is_owner = 0
+        async for is_owner, page in self.iter_detail(pwd_id, stoken):
+            root.extend(i for i in page if i.fid not in saved)
+        if is_owner == 1:
+            plan.update(status='skip', message='sudah ada di penyimpanan cloud')
+            return plan
+        if entry_filter:
+            root = entry_filter.apply(root)
+        entries, failed = await self.walk_share(pwd_id, stoken, [i for i in root if i.dir], entry_filter=entry_filter)
+        if failed:
+            plan['message'] = f'{len(failed)} folder tidak dapat dibaca'
+            return plan
+        files = [i for i in root + entries if not i.dir and i.fid not in saved]
+        plan.update(status='ok', size=sum(i.size for i in files), files=len(files))
+        return plan
+
+    async def plan_transfers(self, urls: Iterable[str], workers: int = VALIDATE_WORKERS, force: bool = False,
+                             plan_path: str = TRANSFER_PLAN,
+                             entry_filter: Union[EntryFilter, None] = None) -> list[dict[str, Any]]:
+        """Measures every link and marks, in input order, the ones that still fit in the free space.
+
+        A link that does not fit is left out and later, smaller links may still take its place.
+        """
+        total, used = await self.get_capacity()
+        free = total - used - QUOTA_RESERVE
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        plans: list[dict[str, Any]] = []
+
+        async def worker() -> None:
+            while (item := await queue.get()) is not None:
+                index, url = item
+                try:
+                    plan = await self.measure_share(url, force=force, entry_filter=entry_filter)
+                except Exception as e:
+                    plan = {'url': url, 'size': 0, 'files': 0, 'status': 'error', 'message': f'{type(e).__name__}: {e}'}
+                plan['index'] = index
+                plans.append(plan)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+        try:
+            for index, url in enumerate(urls, 1):
+                await queue.put((index, url.strip()))
+        finally:
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+
+        plans.sort(key=lambda p: p['index'])
+        remaining = free
+        for plan in plans:
+            plan['fits'] = plan['status'] == 'ok' and plan['size'] <= remaining
+            if plan['fits']:
+                remaining -= plan['size']
+            elif plan['status'] == 'ok':
+                plan.update(status='full', message='ruang tidak cukup')
+
+        lines = [f'Kapasitas：{format_size(total)}，terpakai {format_size(used)}，sisa {format_size(free)}',
+                 'No | Rencana | Berkas | Ukuran | Tautan | Pesan']
+        for p in plans:
+            lines.append(' | '.join((str(p['index']), 'transfer' if p['fits'] else p['status'], str(p['files']),
+                                     format_size(p['size']), p['url'], p['message'])).rstrip(' |'))
+        save_config(plan_path, '\n'.join(lines) + '\n')
+        fits = [p for p in plans if p['fits']]
+        custom_print(f"Rencana transfer：{len(fits)}/{len(plans)} tautan，{format_size(free - remaining)} dari sisa "
+                     f"{format_size(free)}，rincian di {plan_path}")
+        return plans
+
+    async def batch_run(self, urls: Iterable[str], folder_id: Union[str, None] = None, download: bool = False,
+                        workers: int = TRANSFER_WORKERS, force: bool = False,
+                        entry_filter: Union[EntryFilter, None] = None, incremental: bool = False,
+                        checkpoint: Union[LinkCheckpoint, None] = None) -> list[dict[str, Any]]:
+        """Runs every link with `workers` at a time and returns the results in input order.
+
+        With a `checkpoint`, `urls` should come from checkpoint.links(): deduplication and progress are kept
+        there instead of in memory, every outcome is recorded in it, and only failures are returned.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        results: list[dict[str, Any]] = []
+        seen: set[str] = set()
+        succeeded = 0
+        drive_full = False
+
+        async def worker() -> None:
+            nonlocal drive_full, succeeded
+            while True:
+                item = await queue.get()
+                if item is None:
                     return
-                task_id = await self.get_share_save_task_id(pwd_id, stoken, fid_list, share_fid_token_list,
-                                                            to_pdir_fid=self.folder_id)
-                await self.submit_task(task_id)
-            print()
+                index, url = item
+                if drive_full:
+                    # every later save would fail the same way, so do not start them
+                    results.append({'index': index, 'url': url, 'ok': False, 'error': 'ruang penyimpanan penuh'})
+                    continue
+                error = ''
+                try:
+                    ok = await self.run(url, folder_id, download=download, incremental=incremental, force=force,
+                                        entry_filter=entry_filter)
+                except QuarkTaskError as e:
+                    ok, error = False, str(e)
+                    drive_full = drive_full or e.code == CAPACITY_LIMIT
+                except Exception as e:
+                    ok, error = False, f'{type(e).__name__}: {e}'
+                    custom_print(f'Tautan ke-{index} gagal：{error}', error_msg=True)
+                if checkpoint is not None and not (drive_full and not ok):
+                    checkpoint.done(url, ok, error)
+                succeeded += ok
+                if checkpoint is None or not ok:
+                    results.append({'index': index, 'url': url, 'ok': ok, 'error': error})
+
+        tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+        for index, url in enumerate(urls, 1):
+            pwd_id = parse_share_url(url)[0]
+            if checkpoint is None and pwd_id in seen:
+                # the same share twice in one batch would be saved twice, even with force
+                custom_print(f'Tautan ke-{index} adalah duplikat, dilewati：{url.strip()}')
+                results.append({'index': index, 'url': url.strip(), 'ok': True, 'error': ''})
+                succeeded += 1
+                continue
+            if checkpoint is None:
+                seen.add(pwd_id)
+            await queue.put((index, url.strip()))
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+        if checkpoint is not None:
+            checkpoint.commit()
+
+        results.sort(key=lambda r: r['index'])
+        failed = [r for r in results if not r['ok']]
+        custom_print(f'Transfer massal selesai：{succeeded} berhasil，{len(failed)} gagal')
+        custom_print(f'Laju API saat ini：{self.rate_limiter.summary()}')
+        custom_print(f'Cache：{self.cache.stats()}')
+        for r in failed:
+            custom_print(f"{r['index']}. {r['url']} {r['error']}", error_msg=True)
+        return results
+
+    async def validate_link(self, url: str) -> dict[str, Any]:
+        """Opens a share and its first page; both stay cached for a run that follows."""
+        pwd_id, password = parse_share_url(url)
+        report = {'url': url, 'pwd_id': pwd_id, 'status': 'error', 'items': 0, 'size': 0, 'partial': False,
+                  'is_owner': 0, 'message': ''}
+        if not pwd_id:
+            report['message'] = 'tautan kosong'
+            return report
+        stoken, message = await self.fetch_stoken(pwd_id, password)
+        if not stoken:
+            report['message'] = message
+            return report
+        json_data = await self.get_detail_page(pwd_id, stoken, page=1)
+        if json_data.get('status') != 200 or not json_data.get('data'):
+            report['message'] = json_data.get('message', '')
+            return report
+        files = json_data['data']['list']
+        report.update(status='ok' if files else 'empty', items=json_data['metadata']['_total'],
+                      size=sum(i.get('size', 0) or 0 for i in files), is_owner=json_data['data']['is_owner'],
+                      partial=json_data['metadata']['_total'] > len(files))
+        return report
+
+    async def validate_links(self, urls: Iterable[str], workers: int = VALIDATE_WORKERS,
+                             report_path: str = VALIDATE_REPORT) -> list[dict[str, Any]]:
+        """Checks every link concurrently and writes `index | status | items | size | owner | url | message` lines.
+
+        Sizes only cover the entries of the first page; they are marked with `+` when the share has more.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        reports: list[dict[str, Any]] = []
+
+        async def worker() -> None:
+            while (item := await queue.get()) is not None:
+                index, url = item
+                try:
+                    report = await self.validate_link(url)
+                except Exception as e:
+                    report = {'url': url, 'status': 'error', 'items': 0, 'size': 0, 'partial': False,
+                              'is_owner': 0, 'message': f'{type(e).__name__}: {e}'}
+                report['index'] = index
+                reports.append(report)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+        try:
+            for index, url in enumerate(urls, 1):
+                await queue.put((index, url.strip()))
+        finally:
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+
+        reports.sort(key=lambda r: r['index'])
+        lines = ['No | Status | Item | Ukuran | Pemilik | Tautan | Pesan']
+        for r in reports:
+            size = format_size(r['size']) + ('+' if r['partial'] else '')
+            lines.append(' | '.join((str(r['index']), r['status'], str(r['items']), size,
+                                     'ya' if r['is_owner'] else 'tidak', r['url'], r['message'])).rstrip(' |'))
+        save_config(report_path, '\n'.join(lines) + '\n')
+        counts = {status: sum(r['status'] == status for r in reports) for status in ('ok', 'empty', 'error')}
+        custom_print(f"Validasi selesai：{counts['ok']} valid，{counts['empty']} kosong，{counts['error']} gagal，"
+                     f"laporan disimpan ke {report_path}")
+        return reports
 
     async def get_share_save_task_id(self, pwd_id: str, stoken: str, first_ids: list[str], share_fid_tokens: list[str],
-                                     to_pdir_fid: str = '0') -> str:
+                                     to_pdir_fid: str = '0', pdir_fid: str = '0') -> str:
         task_url = "https://drive.quark.cn/1/clouddrive/share/sharepage/save"
         params = {
             "pr": "ucpro",
@@ -311,33 +940,34 @@ class QuarkPanFileManager:
         data = {"fid_list": first_ids,
                 "fid_token_list": share_fid_tokens,
                 "to_pdir_fid": to_pdir_fid, "pwd_id": pwd_id,
-                "stoken": stoken, "pdir_fid": "0", "scene": "link"}
-
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.post(task_url, json=data, headers=self.headers, params=params, timeout=timeout)
-            json_data = response.json()
-            task_id = json_data['data']['task_id']
-            custom_print(f'Dapatkan Task ID：{task_id}')
-            return task_id
+                "stoken": stoken, "pdir_fid": pdir_fid, "scene": "link"}
+
+        json_data = await self.request_json('save', 'POST', task_url, json=data, headers=self.headers, params=params)
+        task_id = json_data['data']['task_id']
+        custom_print(f'Dapatkan Task ID：{task_id}')
+        return task_id
+
+    async def download_file(self, download_url: str, save_path: str, headers: dict,
+                            position: Union[int, None] = None, size: int = 0, fid: str = '') -> None:
+        from tqdm import tqdm
+
+        with tqdm(unit="B", unit_scale=True, total=size or None,
+                  desc=os.path.basename(save_path),
+                  ncols=80, position=position, leave=position is None) as pbar:
+            await download_to_file(self.get_client(), download_url, headers, save_path, fid, size,
+                                   segments=self.download_segments, min_segment_size=self.min_segment_size,
+                                   on_progress=pbar.update)
+
+    def get_download_headers(self) -> dict[str, str]:
+        return {
+            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, "
+                          "like Gecko) Chrome/143.0.0.0 Safari/537.36 Edg/143.0.0.0",
+            "origin": "https://pan.quark.cn",
+            "referer": "https://pan.quark.cn/",
+            "cookie": self.cookies
+        }
 
-    @staticmethod
-    async def download_file(download_url: str, save_path: str, headers: dict) -> None:
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            async with client.stream("GET", download_url, headers=headers, timeout=timeout) as response:
-                if response.headers.get("content-length") is None:
-                    response.headers["content-length"] = "0"
-                with open(save_path, "wb") as f:
-                    with tqdm(unit="B", unit_scale=True,
-                              desc=os.path.basename(save_path),
-                              ncols=80) as pbar:
-                        async for chunk in response.aiter_bytes():
-                            f.write(chunk)
-                            pbar.update(len(chunk))
-
-    async def quark_file_download(self, fids: list[str], folder: str = '', folders_map=None) -> None:
-        folders_map = folders_map or {}
+    async def get_download_info(self, fids: list[str]) -> Union[list[dict], None]:
         params = {
             'pr': 'ucpro',
             'fr': 'pc',
@@ -365,107 +995,183 @@ class QuarkPanFileManager:
         download_api = 'https://drive-pc.quark.cn/1/clouddrive/file/download'
 
         for _ in range(2):
-            async with httpx.AsyncClient() as client:
-                timeout = httpx.Timeout(60.0, connect=60.0)
-                response = await client.post(download_api, json=data, headers=headers, params=params, timeout=timeout)
-                json_data = response.json()
-
-                if json_data.get('code') == 23018:
-                    headers['User-Agent'] = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                                             "(KHTML, like Gecko) quark-cloud-drive/2.5.56 Chrome/100.0.4896.160 "
-                                             "Electron/18.3.5.12-a038f7b798 Safari/537.36 Channel/pckk_other_ch")
+            json_data = await self.request_json('download', 'POST', download_api, json=data, headers=headers,
+                                                params=params)
+
+            if json_data.get('code') == 23018:
+                headers['User-Agent'] = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                                         "(KHTML, like Gecko) quark-cloud-drive/2.5.56 Chrome/100.0.4896.160 "
+                                         "Electron/18.3.5.12-a038f7b798 Safari/537.36 Channel/pckk_other_ch")
+                continue
+
+            data_list = json_data.get('data', None)
+            if json_data['status'] != 200:
+                custom_print(f"agal mengambil daftar alamat unduhan file., {json_data['message']}", error_msg=True)
+                return None
+            elif data_list:
+                custom_print('Daftar alamat unduhan file berhasil diambil.')
+            return data_list
+        return None
+
+    def new_download_scheduler(self, workers: int = DOWNLOAD_WORKERS,
+                               manifest: Union[DownloadManifest, None] = None) -> DownloadScheduler:
+        headers = self.get_download_headers()
+
+        async def fetch(job: DownloadJob, slot: int) -> None:
+            custom_print(f'Mulai mengunduh yang pertama{job.index}berkas-{job.file_name}')
+            await self.download_file(job.download_url, job.save_path, headers=headers,
+                                     position=slot if workers > 1 else None, size=job.size, fid=job.fid)
+            if manifest is not None:
+                manifest.record(job.fid, job.save_path, job.size, job.updated_at)
+
+        async def refresh(job: DownloadJob) -> None:
+            data_list = await self.get_download_info([job.fid])
+            if data_list:
+                job.download_url = data_list[0]["download_url"]
+
+        return DownloadScheduler(fetch, refresh=refresh, workers=workers)
+
+    async def quark_file_download(self, fids: list[str], folder: str = '',
+                                  folders_map: Union[FolderIndex, None] = None,
+                                  scheduler: Union[DownloadScheduler, None] = None,
+                                  entries: Union[dict[str, FileEntry], None] = None,
+                                  manifest: Union[DownloadManifest, None] = None) -> None:
+        folders_map = folders_map if folders_map is not None else FolderIndex()
+
+        if manifest is not None and entries:
+            # incremental mode: only new or changed files go to the file/download call
+            changed = []
+            for fid in fids:
+                entry = entries.get(fid)
+                if entry is None:
+                    changed.append(fid)
+                elif entry.dir:
                     continue
+                elif not manifest.is_current(fid, os.path.join(folders_map.folder_path(entry.pdir_fid),
+                                                               entry.file_name),
+                                             entry.size, entry.updated_at):
+                    changed.append(fid)
+            if len(changed) < len(fids):
+                custom_print(f'Mode inkremental：{len(fids) - len(changed)} item dilewati，{len(changed)} diunduh')
+            fids = changed
+            if not fids:
+                return
 
-                data_list = json_data.get('data', None)
-                if json_data['status'] != 200:
-                    custom_print(f"agal mengambil daftar alamat unduhan file., {json_data['message']}", error_msg=True)
-                    return
-                elif data_list:
-                    custom_print('Daftar alamat unduhan file berhasil diambil.')
-
-                save_folder = 'downloads'  # if folder else 'downloads'
-                os.makedirs(save_folder, exist_ok=True)
-                n = 0
-                for i in data_list:
-                    n += 1
-                    filename = i["file_name"]
-                    custom_print(f'Mulai mengunduh yang pertama{n}berkas-{filename}')
-
-                    # build save path start
-                    base_path = ""
-                    if "pdir_fid" in i:
-                        pdir_fid = i["pdir_fid"]
-                        while pdir_fid in folders_map:
-                            base_path = "/" + folders_map[pdir_fid]["file_name"] + base_path
-                            pdir_fid = folders_map[pdir_fid]["pdir_fid"]
-                    final_save_folder = f"{save_folder}/{base_path}"
-                    os.makedirs(final_save_folder, exist_ok=True)
-                    # build save path stop
-
-                    download_url = i["download_url"]
-                    save_path = os.path.join(final_save_folder, filename)
-                    headers = {
-                        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, "
-                                      "like Gecko) Chrome/143.0.0.0 Safari/537.36 Edg/143.0.0.0",
-                        "origin": "https://pan.quark.cn",
-                        "referer": "https://pan.quark.cn/",
-                        "cookie": self.cookies
-                    }
-                    await self.download_file(download_url, save_path, headers=headers)
+        data_list = await self.get_download_info(fids)
+        if not data_list:
             return
 
-    async def submit_task(self, task_id: str, retry: int = 50) -> bool | dict:
-
-        for i in range(retry):
-            await asyncio.sleep(random.randint(500, 1000) / 1000)
-            custom_print(f'TIDAK{i + 1}Kirim tugas')
-            submit_url = (f"https://drive-pc.quark.cn/1/clouddrive/task?pr=ucpro&fr=pc&uc_param_str=&task_id={task_id}"
-                          f"&retry_index={i}&__dt=21192&__t={get_timestamp(13)}")
+        jobs = []
+        for i in data_list:
+            filename = i["file_name"]
+            final_save_folder = folders_map.ensure_folder(i.get("pdir_fid", ''))
+            save_path = os.path.join(final_save_folder, filename)
+            fid = i.get("fid", '')
+            updated_at = entries[fid].updated_at if entries and fid in entries else i.get("updated_at", 0)
+            jobs.append(DownloadJob(fid=fid, file_name=filename, size=int(i.get("size") or 0),
+                                    save_path=save_path, download_url=i["download_url"], updated_at=updated_at))
+
+        if scheduler is not None:
+            scheduler.submit(jobs)
+            return
 
-            async with httpx.AsyncClient() as client:
-                timeout = httpx.Timeout(60.0, connect=60.0)
-                response = await client.get(submit_url, headers=self.headers, timeout=timeout)
-                json_data = response.json()
+        scheduler = self.new_download_scheduler(manifest=manifest)
+        scheduler.submit(jobs)
+        done, failed = await scheduler.join()
+        custom_print(f'Unduhan selesai：{len(done)} berhasil，{len(failed)} gagal')
 
-            if json_data['message'] == 'ok':
-                if json_data['data']['status'] == 2:
-                    if 'to_pdir_name' in json_data['data']['save_as']:
-                        folder_name = json_data['data']['save_as']['to_pdir_name']
-                    else:
-                        folder_name = ' direktori akar'
-                    if json_data['data']['task_title'] == 'Bagikan - Simpan':
-                        custom_print(f"Akhir dari Task ID：{task_id}")
-                        custom_print(f'Lokasi penyimpanan file：{folder_name} Map')
-                    return json_data
+    async def poll_task(self, task_id: str, retry_index: int = 0) -> dict[str, Any]:
+        params = {
+            'pr': 'ucpro',
+            'fr': 'pc',
+            'uc_param_str': '',
+            'task_id': task_id,
+            'retry_index': retry_index,
+            '__dt': random.randint(100, 9999),
+            '__t': get_timestamp(13),
+        }
+        return await self.request_json('task', 'GET', 'https://drive-pc.quark.cn/1/clouddrive/task',
+                                       params=params, headers=self.headers)
+
+    def get_task_tracker(self) -> TaskTracker:
+        if self.task_tracker is None:
+            self.task_tracker = TaskTracker(self.poll_task)
+        return self.task_tracker
+
+    async def submit_task(self, task_id: str) -> TaskResult:
+        result = await self.get_task_tracker().wait(task_id)
+        if result.ok:
+            if 'to_pdir_name' in result.data.get('save_as', {}):
+                folder_name = result.data['save_as']['to_pdir_name']
             else:
-                if json_data['code'] == 32003 and 'capacity limit' in json_data['message']:
-                    custom_print("Transfer gagal, ruang penyimpanan cloud tidak mencukupi! Harap perhatikan jumlah item yang sudah berhasil disimpan untuk menghindari penyimpanan ganda.", error_msg=True)
-                elif json_data['code'] == 41013:
-                    custom_print(f"”{to_dir_name}“ Folder penyimpanan cloud tidak ada. Silakan jalankan program lagi, tekan 3 untuk mengubah direktori penyimpanan, dan coba lagi!", error_msg=True)
-                else:
-                    custom_print(f"pesan kesalahan：{json_data['message']}", error_msg=True)
-                input(f'[{get_datetime()}] Program tersebut telah berakhir.')
-                sys.exit()
+                folder_name = ' direktori akar'
+            custom_print(f"Akhir dari Task ID：{task_id}")
+            to_pdir_fid = result.data.get('save_as', {}).get('to_pdir_fid')
+            if to_pdir_fid:
+                self.cache.invalidate('drive', to_pdir_fid)
+            else:
+                self.cache.invalidate('drive')
+            if self.drive_index is not None and to_pdir_fid:
+                self.drive_index.invalidate(to_pdir_fid)
+            custom_print(f'Lokasi penyimpanan file：{folder_name} Map')
+        elif result.capacity_exceeded:
+            custom_print("Transfer gagal, ruang penyimpanan cloud tidak mencukupi! Harap perhatikan jumlah item yang sudah berhasil disimpan untuk menghindari penyimpanan ganda.", error_msg=True)
+        elif result.folder_missing:
+            custom_print(f"”{self.dir_name}“ Folder penyimpanan cloud tidak ada. Silakan jalankan program lagi, tekan 3 untuk mengubah direktori penyimpanan, dan coba lagi!", error_msg=True)
+        else:
+            custom_print(f"pesan kesalahan：{result.message}", error_msg=True)
+        return result
 
     def init_config(self, _user, _pdir_id, _dir_name):
         try:
             os.makedirs('share', exist_ok=True)
-            json_data = read_config(f'{CONFIG_DIR}/config.json', 'json')
+            json_data = read_config(self.config_path, 'json')
             if json_data:
                 user = json_data.get('user', 'jack')
                 if user != _user:
                     _pdir_id = '0'
                     _dir_name = 'direktori akar'
                     new_config = {'user': _user, 'pdir_id': _pdir_id, 'dir_name': _dir_name}
-                    save_config(f'{CONFIG_DIR}/config.json', content=json.dumps(new_config, ensure_ascii=False))
+                    save_config(self.config_path, content=json.dumps(new_config, ensure_ascii=False))
                 else:
                     _pdir_id = json_data.get('pdir_id', '0')
                     _dir_name = json_data.get('dir_name', 'direktori akar')
         except (json.decoder.JSONDecodeError, FileNotFoundError):
             new_config = {'user': self.user, 'pdir_id': self.pdir_id, 'dir_name': self.dir_name}
-            save_config(f'{CONFIG_DIR}/config.json', content=json.dumps(new_config, ensure_ascii=False))
+            save_config(self.config_path, content=json.dumps(new_config, ensure_ascii=False))
         return _user, _pdir_id, _dir_name
 
+    def save_folder_config(self, pdir_id: str, dir_name: str) -> None:
+        self.pdir_id, self.dir_name = pdir_id, dir_name
+        new_config = {'user': self.user, 'pdir_id': self.pdir_id, 'dir_name': self.dir_name}
+        save_config(self.config_path, content=json.dumps(new_config, ensure_ascii=False))
+
+    async def switch_folder(self, target: str) -> bool:
+        """Makes `target` the save folder: `0` for the root, a path such as `/Film/2024`, a folder
+        fid, or the name of a folder in the root."""
+        target = target.strip()
+        if target == '0':
+            self.save_folder_config('0', 'direktori akar')
+            return True
+        index = self.get_drive_index()
+        if '/' in target:
+            fid = index.resolve(target)
+            if fid is None:
+                index = await self.refresh_drive_index(depth=len(target.strip('/').split('/')))
+                fid = index.resolve(target)
+        elif len(target) >= 32:
+            fid = target
+        else:
+            fid = index.resolve(target)
+            if fid is None:
+                index = await self.refresh_drive_index(depth=1)
+                fid = index.resolve(target)
+        if fid is None:
+            custom_print(f'Folder {target} tidak ditemukan; peralihan direktori penyimpanan gagal.', error_msg=True)
+            return False
+        self.save_folder_config(fid, index.path_of(fid) or fid)
+        return True
+
     async def load_folder_id(self, renew=False) -> Union[tuple, None]:
 
         self.user = await self.get_user_info()
@@ -475,17 +1181,19 @@ class QuarkPanFileManager:
             custom_print(f'Direktori penyimpanan cloud Anda saat ini: {self.dir_name} Map')
 
         if renew:
-            pdir_id = input(f'[{get_datetime()}] Silakan masukkan ID folder untuk lokasi penyimpanan (boleh kosong): ')
-            if pdir_id == '0':
-                self.dir_name = 'direktori akar'
-                new_config = {'user': self.user, 'pdir_id': self.pdir_id, 'dir_name': self.dir_name}
-                save_config(f'{CONFIG_DIR}/config.json', content=json.dumps(new_config, ensure_ascii=False))
+            pdir_id = input(f'[{get_datetime()}] Silakan masukkan ID folder atau path (mis. /Film/2024) untuk lokasi penyimpanan (boleh kosong): ')
+            if pdir_id == '0' or '/' in pdir_id:
+                # the root, or a path such as /Film/2024 looked up in the local drive index
+                if not await self.switch_folder(pdir_id):
+                    json_data = read_config(self.config_path, 'json')
+                    return json_data['pdir_id'], json_data['dir_name']
 
             elif len(pdir_id) < 32:
-                file_list_data = await self.get_sorted_file_list()
-                fd_list = file_list_data['data']['list']
-                fd_list = [{i['fid']: i['file_name']} for i in fd_list if i.get('dir')]
+                index = await self.refresh_drive_index(depth=1)
+                fd_list = [{i['fid']: i['file_name']} for i in index.children(ROOT_FID, dirs_only=True)]
                 if fd_list:
+                    from prettytable import PrettyTable
+
                     table = PrettyTable(['Nomor seri', 'ID Folder', 'Nama Folder'])
                     for idx, item in enumerate(fd_list, 1):
                         key, value = next(iter(item.items()))
@@ -494,13 +1202,11 @@ class QuarkPanFileManager:
                     num = input(f'[{get_datetime()}] Silakan pilih lokasi tempat Anda ingin menyimpan (masukkan nomor yang sesuai). : ')
                     if not num or int(num) > len(fd_list):
                         custom_print('Nomor seri yang dimasukkan tidak ada; peralihan direktori penyimpanan gagal.', error_msg=True)
-                        json_data = read_config(f'{CONFIG_DIR}/config.json', 'json')
+                        json_data = read_config(self.config_path, 'json')
                         return json_data['pdir_id'], json_data['dir_name']
 
                     item = fd_list[int(num) - 1]
-                    self.pdir_id, self.dir_name = next(iter(item.items()))
-                    new_config = {'user': self.user, 'pdir_id': self.pdir_id, 'dir_name': self.dir_name}
-                    save_config(f'{CONFIG_DIR}/config.json', content=json.dumps(new_config, ensure_ascii=False))
+                    self.save_folder_config(*next(iter(item.items())))
 
         return self.pdir_id, self.dir_name
 
@@ -528,27 +1234,15 @@ class QuarkPanFileManager:
             'uc_param_str': '',
         }
 
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.post('https://drive-pc.quark.cn/1/clouddrive/share', params=params,
-                                         json=json_data, headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            return json_data['data']['task_id']
+        json_data = await self.request_json('share', 'POST', 'https://drive-pc.quark.cn/1/clouddrive/share',
+                                            params=params, json=json_data, headers=self.headers)
+        return json_data['data']['task_id']
 
     async def get_share_id(self, task_id: str) -> str:
-        params = {
-            'pr': 'ucpro',
-            'fr': 'pc',
-            'uc_param_str': '',
-            'task_id': task_id,
-            'retry_index': '0',
-        }
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.get('https://drive-pc.quark.cn/1/clouddrive/task', params=params,
-                                        headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            return json_data['data']['share_id']
+        result = await self.get_task_tracker().wait(task_id, delay=0)
+        if not result.ok:
+            raise QuarkTaskError(result.code, result.message)
+        return result.data['share_id']
 
     async def submit_share(self, share_id: str) -> tuple:
         params = {
@@ -560,35 +1254,192 @@ class QuarkPanFileManager:
         json_data = {
             'share_id': share_id,
         }
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.post('https://drive-pc.quark.cn/1/clouddrive/share/password', params=params,
-                                         json=json_data, headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            share_url = json_data['data']['share_url']
-            title = json_data['data']['title']
-            if 'passcode' in json_data['data']:
-                share_url = share_url + f"?pwd={json_data['data']['passcode']}"
-            return share_url, title
+        json_data = await self.request_json('share', 'POST',
+                                            'https://drive-pc.quark.cn/1/clouddrive/share/password',
+                                            params=params, json=json_data, headers=self.headers)
+        share_url = json_data['data']['share_url']
+        title = json_data['data']['title']
+        if 'passcode' in json_data['data']:
+            share_url = share_url + f"?pwd={json_data['data']['passcode']}"
+        return share_url, title
+
+    async def list_drive_items(self, pdir_fid: str, folders_only: bool = False) -> list[dict[str, Any]]:
+        """Children of `pdir_fid` in name order (folders first); pages after the first are fetched concurrently."""
+        sort = 'file_type:asc,file_name:asc'
+        json_data = await self.get_sorted_file_list(pdir_fid, page='1', size=str(SORT_PAGE_SIZE), fetch_total='1',
+                                                    sort=sort)
+        items = list(json_data['data']['list'])
+        _total = json_data['metadata']['_total']
+        _size = json_data['metadata']['_size']
+        pages = -(-_total // _size) if _size else 1
+        # folders sort before files, so a first page that already ends in a file holds every folder
+        if pages > 1 and items and (items[-1]['dir'] or not folders_only):
+            rest = await asyncio.gather(*(self.get_sorted_file_list(pdir_fid, page=str(page), size=str(SORT_PAGE_SIZE),
+                                                                    fetch_total='1', sort=sort)
+                                          for page in range(2, pages + 1)))
+            for page_data in rest:
+                items.extend(page_data['data']['list'])
+        return [i for i in items if i['dir']] if folders_only else items
+
+    async def list_drive_folders(self, pdir_fid: str) -> list[dict[str, Any]]:
+        return await self.list_drive_items(pdir_fid, folders_only=True)
+
+    def get_drive_index(self) -> DriveIndex:
+        if self.drive_index is None:
+            self.drive_index = DriveIndex(f'{self.config_dir}/drive_index.db')
+        return self.drive_index
+
+    async def refresh_drive_index(self, root_fid: str = ROOT_FID, depth: Union[int, None] = None,
+                                  full: bool = False, workers: int = LISTING_WORKERS,
+                                  failed: Union[list[tuple[str, str]], None] = None) -> DriveIndex:
+        """Brings the index up to date for the tree below `root_fid`, `depth` levels deep (all levels by default).
+
+        `root_fid` is always listed. Below it, a folder is listed again only if its `updated_at` differs from
+        the one recorded at its last listing, that listing has expired, or `full` is set; other folders keep
+        their indexed children. Folders that could not be listed are appended to `failed` as `(fid, error)`.
+        """
+        failed = failed if failed is not None else []
+        index = self.get_drive_index()
+        if full:
+            self.cache.invalidate('drive')
+        queue: asyncio.Queue = asyncio.Queue()
+        listed = 0
+
+        async def worker() -> None:
+            nonlocal listed
+            while True:
+                fid, level, updated_at = await queue.get()
+                try:
+                    if fid == root_fid or full or not index.is_current(fid, updated_at):
+                        children = await self.list_drive_items(fid)
+                        index.replace_children(fid, children, updated_at)
+                        listed += 1
+                    else:
+                        children = index.children(fid, dirs_only=True)
+                    if depth is None or level + 1 < depth:
+                        for i in children:
+                            if i['dir']:
+                                queue.put_nowait((i['fid'], level + 1, i.get('updated_at', 0) or 0))
+                except Exception as e:
+                    custom_print(f'Gagal mendaftar folder {fid}：{type(e).__name__}: {e}', error_msg=True)
+                    failed.append((fid, f'{type(e).__name__}: {e}'))
+                finally:
+                    queue.task_done()
+
+        queue.put_nowait((root_fid, 0, 0))
+        tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+        try:
+            await queue.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        custom_print(f'Indeks drive diperbarui：{listed} folder didaftar ulang, {len(index)} entri')
+        return index
+
+    async def iter_share_targets(self, root_fid: str, depth: int) -> AsyncIterator[tuple[tuple[str, ...], str]]:
+        """Yields `(path, fid)` for every folder exactly `depth` levels below `root_fid`, in name order.
+
+        Raises RuntimeError before yielding anything if part of the tree could not be listed, since the
+        folders below it would be silently missing from the targets.
+        """
+        failed: list[tuple[str, str]] = []
+        index = await self.refresh_drive_index(root_fid, depth=depth, failed=failed)
+        if failed:
+            fid, error = failed[0]
+            raise RuntimeError(f'{len(failed)} folder tidak dapat didaftar (mis. {fid}：{error})')
+        for path, fid in index.folders_at_depth(root_fid, depth):
+            yield path, fid
+
+    async def share_folder(self, fid: str, title: str, url_type: int = 1, expired_type: int = 2,
+                           password: str = '') -> str:
+        task_id = await self.get_share_task_id(fid, title, url_type=url_type, expired_type=expired_type,
+                                               password=password)
+        share_id = await self.get_share_id(task_id)
+        share_url, _ = await self.submit_share(share_id)
+        return share_url
+
+    def get_result_store(self) -> ResultStore:
+        if self.results is None:
+            self.results = ResultStore()
+        return self.results
+
+    def export_share_results(self, run_id: Union[str, None] = None, full: bool = True) -> Union[str, None]:
+        """Writes share_url.txt (and with `full` share_error.txt and retry.txt) for a run, the latest by default."""
+        store = self.get_result_store()
+        run_id = run_id or store.latest_run()
+        if run_id is None:
+            return None
+        if full:
+            store.export(run_id, 'share/share_url.txt', 'share/share_error.txt', 'share/retry.txt')
+        else:
+            store.export(run_id, 'share/share_url.txt')
+        return run_id
+
+    async def share_folders(self, targets: AsyncIterator[tuple[int, tuple[str, ...], str]], run_id: str,
+                            url_type: int = 1, expired_type: int = 2, password: str = '',
+                            workers: int = SHARE_WORKERS) -> tuple[int, list[tuple[int, tuple[str, ...], str]]]:
+        """Shares `(n, path, fid)` targets with a pool of workers and records every outcome under `run_id`.
+
+        Returns the number of shared folders and the targets that failed.
+        """
+        store = self.get_result_store()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        failed: list[tuple[int, tuple[str, ...], str]] = []
+        shared = 0
+
+        async def worker() -> None:
+            nonlocal shared
+            while (item := await queue.get()) is not None:
+                n, path, fid = item
+                name = '/'.join(path)
+                url, error = '', ''
+                for attempt in range(SHARE_RETRIES):
+                    try:
+                        custom_print(f'{n}.Mulai berbagi {name} Map')
+                        url = await self.share_folder(fid, path[-1], url_type=url_type, expired_type=expired_type,
+                                                      password=password)
+                        custom_print(f'{n}.Berhasil dibagikan {name} Map')
+                        break
+                    except Exception as e:
+                        error = f'{type(e).__name__}: {e}'
+                    if attempt < SHARE_RETRIES - 1:
+                        await asyncio.sleep(2 ** attempt)
+                if url:
+                    shared += 1
+                    store.record(run_id, n, path, fid, 'ok', url=url)
+                else:
+                    failed.append((n, path, fid))
+                    print('Berbagi gagal：', error)
+                    store.record(run_id, n, path, fid, 'failed', error=error)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+        try:
+            async for n, path, fid in targets:
+                await queue.put((n, path, fid))
+        finally:
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+            store.checkpoint()
+        failed.sort()
+        return shared, failed
 
     async def share_run(self, share_url: str, folder_id: Union[str, None] = None, url_type: int = 1,
-                        expired_type: int = 2, password: str = '', traverse_depth: int = 2) -> None:
-        first_dir = ''
-        second_dir = ''
+                        expired_type: int = 2, password: str = '', traverse_depth: int = 2) -> Union[str, None]:
+        """Shares the folder of `share_url` (or the folders `traverse_depth` levels below it) and returns the
+        run_id its results are stored under, None if the run could not start or was aborted."""
+        run_id = None
         try:
-            self.folder_id = folder_id
             custom_print(f'Alamat web folder：{share_url}')
             pwd_id = share_url.rsplit('/', maxsplit=1)[1].split('-')[0]
 
-            first_page = 1
-            n = 0
-            error = 0
             os.makedirs('share', exist_ok=True)
             save_share_path = 'share/share_url.txt'
-
             safe_copy(save_share_path, 'share/share_url_backup.txt')
-            with open(save_share_path, 'w', encoding='utf-8'):
-                pass
+
+            store = self.get_result_store()
+            run_id = store.new_run(share_url)
 
             # 如果遍历深度为0，直接分享根目录
             if traverse_depth == 0:
@@ -599,164 +1450,99 @@ class QuarkPanFileManager:
                                                            password=password)
                     share_id = await self.get_share_id(task_id)
                     share_url, title = await self.submit_share(share_id)
-                    with open(save_share_path, 'a', encoding='utf-8') as f:
-                        content = f'1 | {title} | {share_url}'
-                        f.write(content + '\n')
-                        custom_print(f'membagikan {title} berhasil')
-                    return
+                    store.record(run_id, 1, (title,), pwd_id, 'ok', url=share_url)
+                    custom_print(f'membagikan {title} berhasil')
                 except Exception as e:
                     print('分享失败：', e)
-                    return
+                    store.record(run_id, 1, ('direktori akar',), pwd_id, 'failed', error=f'{type(e).__name__}: {e}')
+                self.export_share_results(run_id, full=False)
+                return run_id
 
-            while True:
-                json_data = await self.get_sorted_file_list(pwd_id, page=str(first_page), size='50', fetch_total='1',
-                                                            sort='file_type:asc,file_name:asc')
-                for i1 in json_data['data']['list']:
-                    if i1['dir']:
-                        first_dir = i1['file_name']
-                        # 如果遍历深度为1，直接分享一级目录
-                        if traverse_depth == 1:
-                            n += 1
-                            share_success = False
-                            share_error_msg = ''
-                            fid = ''
-                            for i in range(3):
-                                try:
-                                    custom_print(f'{n}.Mulai berbagi {first_dir} Map')
-                                    random_time = random.choice([0.5, 1, 1.5, 2])
-                                    await asyncio.sleep(random_time)
-                                    fid = i1['fid']
-                                    task_id = await self.get_share_task_id(fid, first_dir, url_type=url_type,
-                                                                           expired_type=expired_type,
-                                                                           password=password)
-                                    share_id = await self.get_share_id(task_id)
-                                    share_url, title = await self.submit_share(share_id)
-                                    with open(save_share_path, 'a', encoding='utf-8') as f:
-                                        content = f'{n} | {first_dir} | {share_url}'
-                                        f.write(content + '\n')
-                                        custom_print(f'{n}.Berhasil dibagikan {first_dir} Map')
-                                        share_success = True
-                                        break
-                                except Exception as e:
-                                    share_error_msg = e
-                                    error += 1
-
-                            if not share_success:
-                                print('Berbagi gagal：', share_error_msg)
-                                save_config('./share/share_error.txt',
-                                            content=f'{error}.{first_dir} 文件夹\n', mode='a')
-                                save_config('./share/retry.txt',
-                                            content=f'{n} | {first_dir} | {fid}\n', mode='a')
-                            continue
+            async def numbered() -> AsyncIterator[tuple[int, tuple[str, ...], str]]:
+                n = 0
+                async for path, fid in self.iter_share_targets(pwd_id, traverse_depth):
+                    n += 1
+                    yield n, path, fid
 
-                        # 遍历深度为2，遍历二级目录
-                        second_page = 1
-                        while True:
-                            # print(f'正在获取{first_dir}第{first_page}页，二级目录第{second_page}页，目前共分享{n}文件')
-                            json_data2 = await self.get_sorted_file_list(i1['fid'], page=str(second_page),
-                                                                         size='50', fetch_total='1',
-                                                                         sort='file_type:asc,file_name:asc')
-                            for i2 in json_data2['data']['list']:
-                                if i2['dir']:
-                                    n += 1
-                                    share_success = False
-                                    share_error_msg = ''
-                                    fid = ''
-                                    for i in range(3):
-                                        try:
-                                            second_dir = i2['file_name']
-                                            custom_print(f'{n}.开始分享 {first_dir}/{second_dir} 文件夹')
-                                            random_time = random.choice([0.5, 1, 1.5, 2])
-                                            await asyncio.sleep(random_time)
-                                            # print('获取到文件夹ID：', i2['fid'])
-                                            fid = i2['fid']
-                                            task_id = await self.get_share_task_id(fid, second_dir, url_type=url_type,
-                                                                                   expired_type=expired_type,
-                                                                                   password=password)
-                                            share_id = await self.get_share_id(task_id)
-                                            share_url, title = await self.submit_share(share_id)
-                                            with open(save_share_path, 'a', encoding='utf-8') as f:
-                                                content = f'{n} | {first_dir} | {second_dir} | {share_url}'
-                                                f.write(content + '\n')
-                                                custom_print(f'{n}.Berhasil dibagikan {first_dir}/{second_dir} Map')
-                                                share_success = True
-                                                break
-
-                                        except Exception as e:
-                                            share_error_msg = e
-                                            error += 1
-
-                                    if not share_success:
-                                        print('Berbagi gagal：', share_error_msg)
-                                        save_config('./share/share_error.txt',
-                                                    content=f'{error}.{first_dir}/{second_dir} Map\n', mode='a')
-                                        save_config('./share/retry.txt',
-                                                    content=f'{n} | {first_dir} | {second_dir} | {fid}\n', mode='a')
-                            second_total = json_data2['metadata']['_total']
-                            second_size = json_data2['metadata']['_size']
-                            second_page = json_data2['metadata']['_page']
-                            if second_size * second_page >= second_total:
-                                break
-                            second_page += 1
-
-                second_total = json_data['metadata']['_total']
-                second_size = json_data['metadata']['_size']
-                second_page = json_data['metadata']['_page']
-                if second_size * second_page >= second_total:
-                    break
-                first_page += 1
+            try:
+                n, failed = await self.share_folders(numbered(), run_id, url_type=url_type,
+                                                     expired_type=expired_type, password=password)
+            finally:
+                self.export_share_results(run_id, full=False)
             custom_print(f"Sebanyak {n} Folder，Disimpan ke {save_share_path}")
+            if failed:
+                custom_print(f'{len(failed)} folder gagal dibagikan, gunakan "Coba lagi berbagi" untuk mengulanginya',
+                             error_msg=True)
 
         except Exception as e:
             print('Berbagi gagal：', e)
             with open('./share/share_error.txt', 'a', encoding='utf-8') as f:
-                f.write(f'{first_dir}/{second_dir} Map')
-
-    async def share_run_retry(self, retry_url: str, url_type: int = 1, expired_type: int = 2, password: str = ''):
-
-        data_list = retry_url.split('\n')
-        n = 0
-        error = 0
-        save_share_path = 'share/retry_share_url.txt'
-        error_data = []
-        for i1 in data_list:
-            data = i1.split(' | ')
-            if data and len(data) == 4:
-                first_dir = data[-3]
-                second_dir = data[-2]
-                fid = data[-1]
-                share_error_msg = ''
-                for i in range(3):
-                    try:
-                        task_id = await self.get_share_task_id(fid, second_dir, url_type=url_type,
-                                                               expired_type=expired_type,
-                                                               password=password)
-                        share_id = await self.get_share_id(task_id)
-                        share_url, title = await self.submit_share(share_id)
-                        with open(save_share_path, 'a', encoding='utf-8') as f:
-                            content = f'{n} | {first_dir} | {second_dir} | {share_url}'
-                            f.write(content + '\n')
-                            custom_print(f'{n}.Berhasil dibagikan {first_dir}/{second_dir} Map')
-                            share_success = True
-                            break
-                    except Exception as e:
-                        share_error_msg = e
-                        error += 1
+                f.write(f'{share_url} {e}\n')
+            return None
+        return run_id
+
+    async def share_run_retry(self, run_id: Union[str, None] = None, url_type: int = 1, expired_type: int = 2,
+                              password: str = '') -> None:
+        """Shares the failed folders of a run again (the latest run by default), updating its rows in place."""
+        store = self.get_result_store()
+        run_id = run_id or store.latest_run()
+        targets = store.failed(run_id) if run_id else []
+        if not targets:
+            custom_print('Tidak ada folder gagal yang perlu dibagikan ulang.')
+            return
 
-                if not share_success:
-                    print('Berbagi gagal：', share_error_msg)
-                    error_data.append(i1)
-        error_content = '\n'.join(error_data)
-        save_config(path='./share/retry.txt', content=error_content, mode='w')
+        async def pending() -> AsyncIterator[tuple[int, tuple[str, ...], str]]:
+            for target in targets:
+                yield target
 
+        try:
+            n, failed = await self.share_folders(pending(), run_id, url_type=url_type,
+                                                 expired_type=expired_type, password=password)
+        finally:
+            # rewrite share_error.txt and retry.txt too, so links that succeeded now drop out of them
+            self.export_share_results(run_id)
+        custom_print(f'Sebanyak {n} Folder berhasil dibagikan ulang，{len(failed)} gagal')
 
-def load_url_file(fpath: str) -> list[str]:
-    url_pattern = re.compile(r'https?://\S+')
 
-    with open(fpath, encoding='utf-8') as f:
-        content = f.read()
+def input_filter() -> Union[EntryFilter, None]:
+    if input("Saring berkas menurut nama/ekstensi/ukuran/tanggal? (1.Ya 2.Tidak)：") != '1':
+        return None
+
+    while True:
+        try:
+            return build_filter(
+                include=input("Sertakan nama (glob atau re:regex, pisahkan dengan koma, kosong = semua)："),
+                exclude=input("Kecualikan nama berkas/folder (glob atau re:regex, pisahkan dengan koma)："),
+                extensions=input("Ekstensi (mis. mkv,mp4, kosong = semua)："),
+                min_size=input("Ukuran minimum (mis. 1G, kosong = tanpa batas)："),
+                max_size=input("Ukuran maksimum (mis. 4G, kosong = tanpa batas)："),
+                modified_after=input("Diubah sejak (YYYY-MM-DD, kosong = tanpa batas)："),
+                modified_before=input("Diubah sebelum (YYYY-MM-DD, kosong = tanpa batas)："))
+        except (ValueError, re.error) as e:
+            custom_print(f'Filter tidak valid：{e}，silakan ulangi.', error_msg=True)
 
-    return url_pattern.findall(content)
+
+def load_url_file(fpath: str) -> list[str]:
+    return [url for _, url in iter_urls(fpath)]
+
+
+def open_url_checkpoint(fpath: str) -> Union[LinkCheckpoint, None]:
+    """The checkpoint of a link file, asking whether to resume it when an earlier run got part of the way;
+    None when the file has no links."""
+    total = count_urls(fpath)
+    if not total:
+        return None
+    custom_print(f"\rFile {fpath} terdeteksi berisi {total} tautan berbagi")
+    checkpoint = LinkCheckpoint(fpath)
+    counts = checkpoint.counts()
+    if checkpoint.offset or counts:
+        option = input(f"Lanjutkan dari progres sebelumnya ({counts.get('ok', 0)} berhasil，{counts.get('failed', 0)} gagal)? "
+                       f"(1.Lanjutkan 2.Ulangi yang gagal 3.Mulai dari awal)：")
+        if option == '2':
+            checkpoint.reset(failed_only=True)
+        elif option == '3':
+            checkpoint.reset()
+    return checkpoint
 
 
 def print_ascii():
@@ -782,62 +1568,103 @@ def print_menu() -> None:
     print("║     4.Buat folder penyimpanan cloud.                                                                 ║")
     print("║     5.Unduh ke lokal                                                                                 ║")
     print("║     6.Masuk                                                                                          ║")
+    print("║     7.Validasi tautan di url.txt                                                                     ║")
     print("╚══════════════════════════════════════════════════════════════════════════════════════════════════════╝")
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # `python quark.py <command> ...` runs the non-interactive CLI; share this module instead of importing it twice
+        sys.modules.setdefault('quark', sys.modules['__main__'])
+        from cli import main
+
+        sys.exit(main(start=START))
+
+    # One event loop for the whole session so the pooled HTTP connections stay alive between menu actions
+    runner = asyncio.Runner()
     quark_file_manager = QuarkPanFileManager(headless=False, slow_mo=500)
+    to_dir_id, to_dir_name = runner.run(quark_file_manager.load_folder_id())
     while True:
         print_menu()
 
-        to_dir_id, to_dir_name = asyncio.run(quark_file_manager.load_folder_id())
-
-        input_text = input("Masukkan pilihan (1-6 atau q untuk keluar).：")
+        input_text = input("Masukkan pilihan (1-7 atau q untuk keluar).：")
 
         if input_text and input_text.strip() in ['q', 'Q']:
             print("Program telah berakhir.！")
+            runner.run(quark_file_manager.close())
+            runner.close()
             sys.exit(0)
 
-        if input_text and input_text.strip() in [str(i) for i in range(1, 7)]:
+        if input_text and input_text.strip() in [str(i) for i in range(1, 8)]:
             if input_text.strip() == '1':
                 save_option = input("Transfer massal?(1.Ya 2.Tidak)：")
                 if save_option and save_option == '1':
                     try:
-                        urls = load_url_file('./url.txt')
-                        if not urls:
+                        checkpoint = open_url_checkpoint('./url.txt')
+                        if checkpoint is None:
                             custom_print('\nAlamat berbagi kosong! Silakan masukkan alamat berbagi (satu alamat per baris) di file url.txt terlebih dahulu.')
                             continue
 
-                        custom_print(f"\rFile url.txt terdeteksi berisi{len(urls)}Bagikan tautan")
-                        ok = input("Konfirmasi apakah Anda ingin memulai penyimpanan massal (tekan 2 untuk konfirmasi).:")
-                        if ok and ok.strip() == '2':
-                            for index, url in enumerate(urls):
-                                print(f"Saat ini sedang mentransfer yang pertama...{index + 1}个")
-                                asyncio.run(quark_file_manager.run(url.strip(), to_dir_id))
+                        try:
+                            ok = input("Konfirmasi apakah Anda ingin memulai penyimpanan massal (tekan 2 untuk konfirmasi).:")
+                            if ok and ok.strip() == '2':
+                                workers = input(f"Jumlah transfer bersamaan (default {TRANSFER_WORKERS})：")
+                                workers = int(workers) if workers.strip().isdigit() else TRANSFER_WORKERS
+                                force = input("Transfer ulang tautan yang sudah pernah ditransfer? (1.Ya 2.Tidak)：") == '1'
+                                entry_filter = input_filter()
+                                if input("Periksa kuota dan susun rencana transfer dulu? (1.Ya 2.Tidak)：") == '1':
+                                    # the plan needs every remaining link at once
+                                    plans = runner.run(quark_file_manager.plan_transfers(
+                                        checkpoint.links(), force=force, entry_filter=entry_filter))
+                                    urls = [p['url'] for p in plans if p['fits']]
+                                    if not urls or input("Lanjutkan sesuai rencana? (1.Ya 2.Tidak)：") != '1':
+                                        continue
+                                    # links that do not fit stay in front of the checkpoint for the next run
+                                    for plan in plans:
+                                        if plan['status'] in ('skip', 'error'):
+                                            checkpoint.done(plan['url'], plan['status'] == 'skip', plan['message'])
+                                    runner.run(quark_file_manager.batch_run(urls, to_dir_id, workers=workers,
+                                                                            force=force, entry_filter=entry_filter,
+                                                                            checkpoint=checkpoint))
+                                else:
+                                    runner.run(quark_file_manager.batch_run(checkpoint.links(), to_dir_id,
+                                                                            workers=workers, force=force,
+                                                                            entry_filter=entry_filter,
+                                                                            checkpoint=checkpoint))
+                        finally:
+                            checkpoint.close()
                     except FileNotFoundError:
                         with open('url.txt', 'w', encoding='utf-8'):
                             sys.exit(-1)
                 else:
                     url = input("Silakan masukkan alamat berbagi file Quark.：")
                     if url and len(url.strip()) > 20:
-                        asyncio.run(quark_file_manager.run(url.strip(), to_dir_id))
+                        force = False
+                        pwd_id = parse_share_url(url)[0]
+                        if quark_file_manager.get_ledger().share(pwd_id) is not None:
+                            force = input("Tautan ini sudah pernah ditransfer. Transfer ulang? (1.Ya 2.Tidak)：") == '1'
+                        entry_filter = input_filter()
+                        try:
+                            runner.run(quark_file_manager.run(url.strip(), to_dir_id, force=force,
+                                                              entry_filter=entry_filter))
+                        except QuarkTaskError:
+                            custom_print('Transfer tidak selesai.', error_msg=True)
 
             elif input_text.strip() == '2':
-                share_option = input("Silakan masukkan pilihan Anda (1 Bagikan 2 Coba lagi berbagi)：")
+                share_option = input("Silakan masukkan pilihan Anda (1 Bagikan 2 Coba lagi berbagi 3 Ekspor hasil)：")
                 if share_option and share_option == '1':
                     url = input("Silakan masukkan alamat halaman web dari folder yang ingin Anda bagikan.：")
                     if not url or len(url.strip()) < 20:
                         continue
-                else:
-                    try:
-                        url = read_config(path='./share/retry.txt', mode='r')
-                        if not url:
-                            print('\nretry.txt Kosong! Silakan periksa file tersebut.')
-                            continue
-                    except FileNotFoundError:
-                        save_config('./share/retry.txt', content='')
-                        print('\nshare/retry.txt Berkas tersebut kosong.！')
-                        continue
+                elif share_option and share_option == '3':
+                    if quark_file_manager.export_share_results():
+                        print('\nHasil diekspor ke share/share_url.txt, share/share_error.txt dan share/retry.txt')
+                    else:
+                        print('\nBelum ada hasil berbagi.')
+                    continue
+                elif not quark_file_manager.get_result_store().latest_run():
+                    print('\nBelum ada hasil berbagi untuk dicoba lagi.')
+                    continue
 
                 expired_option = {"1": 2, "2": 3, "3": 4, "4": 1}
                 print("1. 1 hari 2. 7 hari 3. 30 hari 4. Permanen")
@@ -850,28 +1677,29 @@ if __name__ == '__main__':
                 print("\n\rSilakan pilih kedalaman penelusuran：")
                 print("0.Jangan melakukan traverse (hanya berbagi direktori root - default) ")
                 print("1.Penelusuran hanya berbagi direktori tingkat pertama.")
-                print("2.Hanya menelusuri dua level direktori\n")
-                traverse_option = input("Silakan masukkan pilihan Anda (0/1/2)：")
+                print("2.Hanya menelusuri dua level direktori")
+                print("N.Bagikan folder pada tingkat ke-N\n")
+                traverse_option = input("Silakan masukkan pilihan Anda (0/1/2/...)：")
                 _traverse_depth = 0  # 默认只分享根目录
-                if traverse_option in ['1', '2']:
+                if traverse_option.strip().isdigit():
                     _traverse_depth = int(traverse_option)
 
                 if share_option and share_option == '1':
-                    asyncio.run(quark_file_manager.share_run(
+                    runner.run(quark_file_manager.share_run(
                         url.strip(), folder_id=to_dir_id, url_type=int(url_encrypt),
                         expired_type=int(_expired_type), password=passcode, traverse_depth=_traverse_depth))
                 else:
-                    asyncio.run(quark_file_manager.share_run_retry(url.strip(), url_type=url_encrypt,
-                                                                   expired_type=_expired_type, password=passcode))
+                    runner.run(quark_file_manager.share_run_retry(url_type=url_encrypt, expired_type=_expired_type,
+                                                                   password=passcode))
 
             elif input_text.strip() == '3':
-                to_dir_id, to_dir_name = asyncio.run(quark_file_manager.load_folder_id(renew=True))
+                to_dir_id, to_dir_name = runner.run(quark_file_manager.load_folder_id(renew=True))
                 custom_print(f"Direktori penyimpanan telah diubah ke penyimpanan cloud. {to_dir_name} Map\n")
 
             elif input_text.strip() == '4':
                 create_name = input("Silakan masukkan nama folder yang ingin Anda buat.：")
                 if create_name:
-                    asyncio.run(quark_file_manager.create_dir(create_name.strip()))
+                    runner.run(quark_file_manager.create_dir(create_name.strip()))
                 else:
                     custom_print("Nama folder yang Anda buat tidak boleh kosong!", error_msg=True)
 
@@ -879,26 +1707,45 @@ if __name__ == '__main__':
                 try:
                     is_batch = input("Masukkan pilihan Anda (1. Unduh dari satu alamat, 2. Unduh secara bertahap):")
                     if is_batch:
+                        incremental = input("Lewati file yang sudah diunduh dan tidak berubah? (1.Ya 2.Tidak)：") == '1'
+                        entry_filter = input_filter()
                         if is_batch.strip() == '1':
                             url = input("Silakan masukkan alamat berbagi file Quark.：")
-                            asyncio.run(quark_file_manager.run(url.strip(), to_dir_id, download=True))
+                            runner.run(quark_file_manager.run(url.strip(), to_dir_id, download=True,
+                                                              incremental=incremental, entry_filter=entry_filter))
                         elif is_batch.strip() == '2':
-                            urls = load_url_file('./url.txt')
-                            if not urls:
+                            checkpoint = open_url_checkpoint('./url.txt')
+                            if checkpoint is None:
                                 print('\nAlamat berbagi kosong! Silakan masukkan alamat berbagi (satu alamat per baris) di file url.txt terlebih dahulu.')
                                 continue
 
-                            for index, url in enumerate(urls):
-                                asyncio.run(quark_file_manager.run(url.strip(), to_dir_id, download=True))
+                            try:
+                                runner.run(quark_file_manager.batch_run(checkpoint.links(), to_dir_id, download=True,
+                                                                        workers=1, incremental=incremental,
+                                                                        entry_filter=entry_filter,
+                                                                        checkpoint=checkpoint))
+                            finally:
+                                checkpoint.close()
 
                 except FileNotFoundError:
                     with open('url.txt', 'w', encoding='utf-8'):
                         sys.exit(-1)
 
             elif input_text.strip() == '6':
-                save_config(f'{CONFIG_DIR}/cookies.txt', '')
+                save_config(quark_file_manager.cookie_path, '')
+                runner.run(quark_file_manager.close())
                 quark_file_manager = QuarkPanFileManager(headless=False, slow_mo=500)
-                quark_file_manager.get_cookies()
+                to_dir_id, to_dir_name = runner.run(quark_file_manager.load_folder_id())
+
+            elif input_text.strip() == '7':
+                try:
+                    urls = load_url_file('./url.txt')
+                except FileNotFoundError:
+                    urls = []
+                if not urls:
+                    print('\nAlamat berbagi kosong! Silakan masukkan alamat berbagi (satu alamat per baris) di file url.txt terlebih dahulu.')
+                    continue
+                runner.run(quark_file_manager.validate_links(urls))
 
         else:
             custom_print("Masukan tidak valid, harap masukkan kembali.")
@@ -1,24 +1,28 @@
 import os
 import time
 from typing import Dict, Union, List
-from playwright.sync_api import sync_playwright
 from retrying import retry
 
 CONFIG_DIR = './config'
+COOKIES_PATH = f'{CONFIG_DIR}/cookies.txt'
+BROWSER_DATA_DIR = './web_browser_data'
 os.makedirs(CONFIG_DIR, exist_ok=True)
 
 
 class QuarkLogin:
-    def __init__(self, headless: bool = True, slow_mo: int = 0):
+    def __init__(self, headless: bool = True, slow_mo: int = 0, cookie_path: str = COOKIES_PATH,
+                 profile_dir: str = BROWSER_DATA_DIR):
         self.headless = headless
         self.slow_mo = slow_mo
+        self.cookie_path = cookie_path
+        self.profile_dir = profile_dir
         self.context = None
 
-    @staticmethod
-    def save_cookies(page) -> None:
+    def save_cookies(self, page) -> None:
         cookie = page.context.cookies()
 
-        with open(f'{CONFIG_DIR}/cookies.txt', 'w', encoding='utf-8') as f:
+        os.makedirs(os.path.dirname(self.cookie_path) or '.', exist_ok=True)
+        with open(self.cookie_path, 'w', encoding='utf-8') as f:
             f.write(str(cookie))
 
     @retry
@@ -30,9 +34,12 @@ class QuarkLogin:
         # if result.returncode != 0:
         #     print("Playwright 安装失败！")
 
+        # imported here so runs with saved cookies never load Playwright
+        from playwright.sync_api import sync_playwright
+
         with sync_playwright() as p:
             self.context = p.firefox.launch_persistent_context(
-                './web_browser_data',
+                self.profile_dir,
                 headless=self.headless,
                 slow_mo=self.slow_mo,
                 args=['--start-maximized'],
@@ -68,7 +75,7 @@ class QuarkLogin:
 
     def check_cookies(self) -> Union[None, Union[Dict[str, str], str]]:
         try:
-            with open(f'{CONFIG_DIR}/cookies.txt', 'r') as f:
+            with open(self.cookie_path, 'r') as f:
                 content = f.read()
 
             if content and '[' in content:
@@ -88,7 +95,7 @@ class QuarkLogin:
         cookie = self.check_cookies()
         if not cookie:
             self.login()
-            with open(f'{CONFIG_DIR}/cookies.txt', 'r') as f:
+            with open(self.cookie_path, 'r') as f:
                 content = f.read()
                 if not content:
                     return
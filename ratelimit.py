@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Union
+
+from utils import custom_print
+
+# endpoint: (starting rate, minimum rate, maximum rate) in requests per second
+ENDPOINT_BUDGETS: dict[str, tuple[float, float, float]] = {
+    'token': (5.0, 0.5, 20.0),
+    'detail': (10.0, 1.0, 50.0),
+    'sort': (5.0, 0.5, 30.0),
+    'account': (2.0, 0.5, 5.0),
+    'member': (2.0, 0.5, 5.0),
+    'file': (2.0, 0.5, 5.0),
+    'save': (2.0, 0.2, 10.0),
+    'task': (4.0, 0.5, 20.0),
+    'share': (2.0, 0.2, 10.0),
+    'download': (4.0, 0.5, 20.0),
+}
+DEFAULT_BUDGET = (2.0, 0.2, 10.0)
+RATE_INCREASE = 0.5  # requests/s added per second of clean responses
+RATE_DECREASE = 0.5  # factor applied to the rate on throttling or errors
+COOLDOWN = 5.0  # seconds without increases after a decrease
+
+
+class TokenBucket:
+    """Token bucket whose refill rate follows AIMD: it grows slowly while responses are clean
+    and is cut in half as soon as the server throttles or errors."""
+
+    def __init__(self, name: str, rate: float, min_rate: float, max_rate: float) -> None:
+        self.name = name
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.cooldown_until = 0.0
+        self.logged_rate = rate
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def success(self) -> None:
+        if time.monotonic() < self.cooldown_until or self.rate >= self.max_rate:
+            return
+        # about RATE_INCREASE per second at the current rate
+        self.rate = min(self.max_rate, self.rate + RATE_INCREASE / self.rate)
+        self.burst = max(1.0, self.rate)
+        if self.rate >= self.logged_rate * 1.25:
+            self.logged_rate = self.rate
+            custom_print(f'Laju {self.name} naik ke {self.rate:.1f} permintaan/detik')
+
+    def throttled(self, reason: str = '') -> None:
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+        self.burst = max(1.0, self.rate)
+        self.tokens = min(self.tokens, self.burst)
+        self.cooldown_until = time.monotonic() + COOLDOWN
+        self.logged_rate = self.rate
+        custom_print(f'Laju {self.name} turun ke {self.rate:.1f} permintaan/detik {reason}'.rstrip(), error_msg=True)
+
+
+class RateLimiter:
+    """One adaptive bucket per API endpoint, shared by every request of a QuarkPanFileManager."""
+
+    def __init__(self, budgets: Union[dict[str, tuple[float, float, float]], None] = None) -> None:
+        self.budgets = budgets or ENDPOINT_BUDGETS
+        self.buckets: dict[str, TokenBucket] = {}
+
+    def get(self, endpoint: str) -> TokenBucket:
+        bucket = self.buckets.get(endpoint)
+        if bucket is None:
+            rate, min_rate, max_rate = self.budgets.get(endpoint, DEFAULT_BUDGET)
+            bucket = self.buckets[endpoint] = TokenBucket(endpoint, rate, min_rate, max_rate)
+        return bucket
+
+    def summary(self) -> str:
+        return '，'.join(f'{name} {bucket.rate:.1f}/s' for name, bucket in self.buckets.items())
+
+
+def is_throttled(status_code: int, json_data: Union[dict, None]) -> bool:
+    if status_code == 429 or status_code >= 500:
+        return True
+    if not isinstance(json_data, dict):
+        return False
+    status = json_data.get('status')
+    if isinstance(status, int) and (status == 429 or status >= 500):
+        return True
+    message = str(json_data.get('message', '')).lower()
+    return any(word in message for word in ('频繁', 'too many', 'too frequent', 'rate limit'))
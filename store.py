@@ -0,0 +1,106 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Union
+
+RESULTS_DB = 'share/results.db'
+RESULT_BATCH = 50  # rows buffered before a commit
+
+
+def connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # FULL: every commit is fsynced, commits themselves are batched by the callers
+    conn.execute('PRAGMA synchronous=FULL')
+    return conn
+
+
+class ResultStore:
+    """Share results of every run, one row per folder, committed in batches."""
+
+    def __init__(self, path: str = RESULTS_DB, batch_size: int = RESULT_BATCH) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = connect(path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                created_at INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS share_results (
+                run_id TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                fid TEXT NOT NULL,
+                status TEXT NOT NULL,
+                url TEXT NOT NULL DEFAULT '',
+                error TEXT NOT NULL DEFAULT '',
+                updated_at INTEGER NOT NULL,
+                PRIMARY KEY (run_id, n)
+            );
+        ''')
+        self.conn.commit()
+        self._pending: list[tuple] = []
+
+    def new_run(self, source: str) -> str:
+        run_id = str(time.time_ns())
+        self.conn.execute('INSERT INTO runs VALUES (?, ?, ?)', (run_id, source, int(time.time())))
+        self.conn.commit()
+        return run_id
+
+    def latest_run(self) -> Union[str, None]:
+        row = self.conn.execute('SELECT run_id FROM runs ORDER BY created_at DESC, run_id DESC LIMIT 1').fetchone()
+        return row[0] if row else None
+
+    def record(self, run_id: str, n: int, path: tuple[str, ...], fid: str, status: str, url: str = '',
+               error: str = '') -> None:
+        self._pending.append((run_id, n, json.dumps(path, ensure_ascii=False), fid, status, url, error,
+                              int(time.time())))
+        if len(self._pending) >= self.batch_size:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        if not self._pending:
+            return
+        self.conn.executemany('INSERT OR REPLACE INTO share_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self._pending)
+        self.conn.commit()
+        self._pending = []
+
+    def failed(self, run_id: str) -> list[tuple[int, tuple[str, ...], str]]:
+        self.checkpoint()
+        rows = self.conn.execute("SELECT n, path, fid FROM share_results WHERE run_id = ? AND status = 'failed' "
+                                 "ORDER BY n", (run_id,))
+        return [(n, tuple(json.loads(path)), fid) for n, path, fid in rows]
+
+    def counts(self, run_id: str) -> dict[str, int]:
+        self.checkpoint()
+        rows = self.conn.execute('SELECT status, COUNT(*) FROM share_results WHERE run_id = ? GROUP BY status',
+                                 (run_id,))
+        return dict(rows.fetchall())
+
+    def export(self, run_id: str, share_url_path: Union[str, None] = None, error_path: Union[str, None] = None,
+               retry_path: Union[str, None] = None) -> None:
+        """Writes the classic text files (`n | path | url`, errors, `n | path | fid`) for one run."""
+        self.checkpoint()
+        rows = self.conn.execute('SELECT n, path, fid, status, url, error FROM share_results WHERE run_id = ? '
+                                 'ORDER BY n', (run_id,)).fetchall()
+        shared, errors, retry = [], [], []
+        for n, path, fid, status, url, error in rows:
+            path = json.loads(path)
+            if status == 'ok':
+                shared.append(' | '.join((str(n), *path, url)))
+            else:
+                errors.append(f"{len(errors) + 1}.{'/'.join(path)} Map {error}".rstrip())
+                retry.append(' | '.join((str(n), *path, fid)))
+        for target, lines in ((share_url_path, shared), (error_path, errors), (retry_path, retry)):
+            if target:
+                with open(target + '.tmp', 'w', encoding='utf-8') as f:
+                    f.write(''.join(line + '\n' for line in lines))
+                os.replace(target + '.tmp', target)
+
+    def close(self) -> None:
+        self.checkpoint()
+        self.conn.close()
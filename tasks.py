@@ -0,0 +1,121 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Union
+
+TASK_POLL_BASE = 0.5  # seconds before the second poll of a task, doubled for every further poll
+TASK_POLL_MAX = 8.0  # upper bound of the delay between two polls of one task
+TASK_TIMEOUT = 600.0  # seconds after which a task that never finished is reported as failed
+
+CAPACITY_LIMIT = 32003
+FOLDER_MISSING = 41013
+TIMEOUT = -1
+
+
+@dataclass
+class TaskResult:
+    task_id: str
+    ok: bool
+    code: int = 0
+    message: str = ''
+    data: Union[dict[str, Any], None] = None
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    @property
+    def capacity_exceeded(self) -> bool:
+        return self.code == CAPACITY_LIMIT
+
+    @property
+    def folder_missing(self) -> bool:
+        return self.code == FOLDER_MISSING
+
+
+@dataclass
+class _PendingTask:
+    future: asyncio.Future
+    due: float
+    deadline: float
+    polls: int = 0
+
+
+class TaskTracker:
+    """Polls many server-side tasks from one loop.
+
+    Every task is polled with its own exponential backoff plus jitter; all tasks that are due
+    are polled together, and each caller gets its TaskResult through a future.
+    """
+
+    def __init__(self, poll: Callable[[str, int], Awaitable[dict[str, Any]]], base_delay: float = TASK_POLL_BASE,
+                 max_delay: float = TASK_POLL_MAX, timeout: float = TASK_TIMEOUT) -> None:
+        self.poll = poll
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.pending: dict[str, _PendingTask] = {}
+        self._wakeup = asyncio.Event()
+        self._runner: Union[asyncio.Task, None] = None
+
+    def track(self, task_id: str, delay: Union[float, None] = None) -> asyncio.Future:
+        if task_id in self.pending:
+            return self.pending[task_id].future
+        now = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self.pending[task_id] = _PendingTask(future, now + (self.base_delay if delay is None else delay),
+                                             now + self.timeout)
+        self._wakeup.set()
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+        return future
+
+    async def wait(self, task_id: str, delay: Union[float, None] = None) -> TaskResult:
+        return await asyncio.shield(self.track(task_id, delay))
+
+    def _next_delay(self, polls: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** polls)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _finish(self, task_id: str, result: TaskResult) -> None:
+        task = self.pending.pop(task_id)
+        if not task.future.done():
+            task.future.set_result(result)
+
+    async def _poll_one(self, task_id: str, task: _PendingTask) -> None:
+        try:
+            json_data = await self.poll(task_id, task.polls)
+        except Exception as e:
+            json_data = None
+            error = f'{type(e).__name__}: {e}'
+        task.polls += 1
+        now = time.monotonic()
+
+        if json_data is not None:
+            if json_data.get('message') != 'ok':
+                self._finish(task_id, TaskResult(task_id, False, json_data.get('code', 0),
+                                                 json_data.get('message', ''), json_data.get('data')))
+                return
+            if (json_data.get('data') or {}).get('status') == 2:
+                self._finish(task_id, TaskResult(task_id, True, 0, 'ok', json_data['data']))
+                return
+            error = 'belum selesai'
+
+        if now >= task.deadline:
+            self._finish(task_id, TaskResult(task_id, False, TIMEOUT, f'batas waktu tugas terlampaui ({error})'))
+        else:
+            task.due = now + self._next_delay(task.polls)
+
+    async def _run(self) -> None:
+        while self.pending:
+            self._wakeup.clear()
+            now = time.monotonic()
+            due = [(task_id, task) for task_id, task in self.pending.items() if task.due <= now]
+            if due:
+                await asyncio.gather(*(self._poll_one(task_id, task) for task_id, task in due))
+                continue
+            next_due = min(task.due for task in self.pending.values())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_due - now))
+            except asyncio.TimeoutError:
+                pass
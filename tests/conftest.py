@@ -0,0 +1,28 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quark  # noqa: E402
+
+
+def entry(fid: str, name: str, pdir_fid: str = '0', is_dir: bool = False, size: int = 0) -> dict:
+    return {'fid': fid, 'file_name': name, 'file_type': 0 if is_dir else 1, 'dir': is_dir, 'pdir_fid': pdir_fid,
+            'share_fid_token': f'tok-{fid}', 'status': 1, 'size': size, 'updated_at': 1}
+
+
+def detail_page(items: list[dict], is_owner: int = 0) -> dict:
+    return {'status': 200, 'code': 0, 'data': {'is_owner': is_owner, 'list': items},
+            'metadata': {'_total': len(items), '_size': 50, '_count': len(items), '_page': 1}}
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A QuarkPanFileManager with a fake cookie and no retry delays; API methods are patched per test."""
+    monkeypatch.setattr(quark.QuarkPanFileManager, 'get_cookies', lambda self: 'c=1')
+    sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, 'sleep', lambda delay, *a: sleep(0, *a))
+    return quark.QuarkPanFileManager(cache_path=None, config_dir=str(tmp_path))
@@ -0,0 +1,50 @@
+import asyncio
+
+from conftest import detail_page, entry
+from filters import build_filter
+
+
+def share_pages(pdir_fid: str) -> dict:
+    pages = {
+        '0': [entry('d1', 'season', is_dir=True), entry('f1', 'movie.mkv', size=100), entry('f2', 'notes.txt', size=1)],
+        'd1': [entry('f3', 'ep1.mkv', 'd1', size=50), entry('f4', 'ep1.srt', 'd1', size=2)],
+    }
+    return detail_page(pages[pdir_fid])
+
+
+def plan_manager(manager, free: int):
+    async def fetch_stoken(pwd_id, password=''):
+        return 'st', ''
+
+    async def get_detail_page(pwd_id, stoken, pdir_fid='0', page=1):
+        return share_pages(pdir_fid)
+
+    async def get_capacity():
+        return free, 0
+
+    manager.fetch_stoken = fetch_stoken
+    manager.get_detail_page = get_detail_page
+    manager.get_capacity = get_capacity
+    return manager
+
+
+def test_measure_share_counts_only_filtered_files(manager):
+    plan_manager(manager, 0)
+    url = 'https://pan.quark.cn/s/abcd'
+    full = asyncio.run(manager.measure_share(url))
+    mkv = asyncio.run(manager.measure_share(url, entry_filter=build_filter(extensions='mkv')))
+    assert (full['files'], full['size']) == (4, 153)
+    assert (mkv['files'], mkv['size']) == (2, 150)
+    asyncio.run(manager.close())
+
+
+def test_plan_fits_a_share_once_filtered(manager, tmp_path):
+    plan_manager(manager, 10)
+    urls = ['https://pan.quark.cn/s/abcd']
+    plan_path = str(tmp_path / 'plan.txt')
+    unfiltered = asyncio.run(manager.plan_transfers(urls, plan_path=plan_path))
+    filtered = asyncio.run(manager.plan_transfers(urls, plan_path=plan_path,
+                                                  entry_filter=build_filter(extensions='txt,srt')))
+    assert not unfiltered[0]['fits']
+    assert filtered[0]['fits'] and filtered[0]['size'] == 3
+    asyncio.run(manager.close())
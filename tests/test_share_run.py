@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+
+def drive_folder(fid: str, name: str) -> dict:
+    return {'fid': fid, 'file_name': name, 'dir': True, 'updated_at': 1}
+
+
+def test_share_targets_abort_when_a_folder_cannot_be_listed(manager):
+    tree = {'root': [drive_folder('a', 'A'), drive_folder('b', 'B')], 'a': [drive_folder('a1', 'A1')]}
+
+    async def list_drive_items(pdir_fid, folders_only=False):
+        if pdir_fid == 'b':
+            raise KeyError('list')
+        return tree.get(pdir_fid, [])
+
+    manager.list_drive_items = list_drive_items
+
+    async def targets():
+        return [target async for target in manager.iter_share_targets('root', 2)]
+
+    with pytest.raises(RuntimeError, match='1 folder'):
+        asyncio.run(targets())
+    asyncio.run(manager.close())
+
+
+def test_share_retry_rewrites_retry_and_error_files(manager, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    attempts = {'b': 0}
+
+    async def share_folder(fid, title, url_type=1, expired_type=2, password=''):
+        if fid == 'b' and attempts['b'] < 3:
+            attempts['b'] += 1
+            raise KeyError('share')
+        return f'https://pan.quark.cn/s/{fid}'
+
+    async def targets():
+        for n, fid in enumerate('ab', 1):
+            yield n, (fid.upper(),), fid
+
+    manager.share_folder = share_folder
+    store = manager.get_result_store()
+    run_id = store.new_run('https://pan.quark.cn/list#/list/all/root')
+    asyncio.run(manager.share_folders(targets(), run_id))
+    manager.export_share_results(run_id)
+    assert (tmp_path / 'share/retry.txt').read_text(encoding='utf-8') == '2 | B | b\n'
+
+    asyncio.run(manager.share_run_retry(run_id))
+    assert (tmp_path / 'share/retry.txt').read_text(encoding='utf-8') == ''
+    assert (tmp_path / 'share/share_error.txt').read_text(encoding='utf-8') == ''
+    assert len((tmp_path / 'share/share_url.txt').read_text(encoding='utf-8').splitlines()) == 2
+    asyncio.run(manager.close())
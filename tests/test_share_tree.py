@@ -0,0 +1,20 @@
+import asyncio
+
+from conftest import detail_page, entry
+from models import FileEntry
+
+
+def test_walk_share_reports_malformed_folder_instead_of_hanging(manager):
+    pages = {
+        'd1': detail_page([entry('d2', 'sub', 'd1', is_dir=True), entry('f1', 'a.mkv', 'd1', size=5)]),
+        'd2': {'status': 200, 'code': 0, 'data': None, 'metadata': {'_total': 1, '_size': 50}},
+    }
+
+    async def get_detail_page(pwd_id, stoken, pdir_fid='0', page=1):
+        return pages[pdir_fid]
+
+    manager.get_detail_page = get_detail_page
+    root = FileEntry.from_api(entry('d1', 'root', is_dir=True))
+    entries, failed = asyncio.run(asyncio.wait_for(manager.walk_share('pwd', 'st', [root]), timeout=5))
+    assert [e.fid for e in entries] == ['d2', 'f1']
+    assert [f.fid for f in failed] == ['d2']
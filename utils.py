@@ -1,12 +1,12 @@
 import json
 import os
 import random
+import re
 import shutil
 import string
 import time
 from datetime import datetime
 from typing import Union
-from colorama import Fore, Style
 
 
 def get_datetime(timestamp: Union[int, float, None] = None, fmt: str = "%Y-%m-%d %H:%M:%S") -> str:
@@ -20,6 +20,7 @@ def get_datetime(timestamp: Union[int, float, None] = None, fmt: str = "%Y-%m-%d
 
 def custom_print(message, error_msg=False) -> None:
     if error_msg:
+        from colorama import Fore, Style
         print(Fore.RED + f'[{get_datetime()}] {message}' + Style.RESET_ALL)
     else:
         print(f'[{get_datetime()}] {message}')
@@ -65,3 +66,19 @@ def generate_random_code(length=4):
     characters = string.ascii_letters + string.digits
     random_code = ''.join(random.choice(characters) for _ in range(length))
     return random_code
+
+
+def parse_share_url(url: str) -> tuple[str, str]:
+    """`(pwd_id, password)` of a share link such as https://pan.quark.cn/s/abcd?pwd=1234#/list/share."""
+    url = url.strip()
+    match_password = re.search(r'pwd=([^&#]*)', url)
+    password = match_password.group(1) if match_password else ''
+    return url.split('?')[0].split('/s/')[-1].split('#')[0], password
+
+
+def format_size(size: Union[int, float]) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f'{size:.1f} {unit}' if unit != 'B' else f'{size} B'
+        size /= 1024
+    return f'{size:.1f} TB'